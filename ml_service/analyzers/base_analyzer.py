@@ -1,14 +1,45 @@
 from abc import ABC, abstractmethod
 
+from utils.pose_sequence import PoseSequence, PoseSequenceBuilder
+
 class BaseAnalyzer(ABC):
-    """Abstract base class for all sport analyzers."""
+    """
+    Abstract base class for all sport analyzers.
 
-    def __init__(self, keypoints_data: list):
-        if not keypoints_data:
-            raise ValueError("Keypoints data cannot be empty.")
+    An analyzer either gets the whole pose sequence up front and is scored with
+    `analyze()`, or is created without one and fed frames as they arrive with
+    `feed()`, reporting `partial_result()` along the way and `finalize()` at the end.
+    """
+
+    # Set to True in analyzers that read `self.pose.segmentation_masks`.
+    # Masks cost extra inference output per frame, so they are only produced on request.
+    requires_segmentation_masks = False
+
+    def __init__(self, keypoints_data: PoseSequence | list | None = None, fps: float | None = None):
+        self._stream = None
+        self._landmarks = None
+        if keypoints_data is None:
+            # Incremental mode: frames arrive through `feed`.
+            self._stream = PoseSequenceBuilder(fps=fps)
+            keypoints_data = PoseSequence.empty(fps)
+        else:
+            # Older callers pass the raw per-frame landmark lists; convert them once up front.
+            if not isinstance(keypoints_data, PoseSequence):
+                keypoints_data = PoseSequence.from_landmark_lists(keypoints_data or [], fps=fps)
+            if len(keypoints_data) == 0:
+                raise ValueError("Keypoints data cannot be empty.")
+        self.pose = keypoints_data
         self.keypoints_data = keypoints_data
-        # The new API returns the list of landmarks directly, so we filter out None values
-        self.landmarks = [lm for lm in keypoints_data if lm]
+
+    @property
+    def landmarks(self) -> list:
+        """
+        Per-frame landmark lists for the frames where a pose was detected.
+        Built on first access; prefer the arrays on `self.pose` for new code.
+        """
+        if self._landmarks is None:
+            self._landmarks = [self.pose.frame_landmarks(i) for i in range(len(self.pose)) if self.pose.valid[i]]
+        return self._landmarks
 
     @abstractmethod
     def analyze(self) -> dict:
@@ -17,3 +48,42 @@ class BaseAnalyzer(ABC):
         Should return a dictionary with the analysis results.
         """
         pass
+
+    # --- Incremental Analysis ---
+    def feed(self, frames: PoseSequence):
+        """
+        Appends the next frames of a test being streamed. Only valid on an
+        analyzer created without keypoints data.
+
+        Args:
+            frames (PoseSequence): The new frames, in order, continuing the timeline of earlier calls.
+        """
+        if self._stream is None:
+            raise RuntimeError("This analyzer was not created for incremental analysis, or was already finalized.")
+        for i in range(len(frames)):
+            self._stream.append(frames.keypoints[i] if frames.valid[i] else None, frames.timestamps_ms[i])
+
+    def _sync_stream(self):
+        """Points `self.pose` at everything fed so far."""
+        if len(self._stream) != len(self.pose):
+            self.pose = self.keypoints_data = self._stream.build()
+            self._landmarks = None
+
+    def partial_result(self) -> dict:
+        """Scores the frames fed so far, without ending the stream."""
+        if self._stream is None:
+            raise RuntimeError("This analyzer was not created for incremental analysis, or was already finalized.")
+        if len(self._stream) == 0:
+            return {"approved": False, "score": 0, "feedback": "No frames received yet.", "metrics": {}}
+        self._sync_stream()
+        return self.analyze()
+
+    def finalize(self) -> dict:
+        """Ends the stream and returns the final analysis of every frame fed."""
+        if self._stream is None:
+            raise RuntimeError("This analyzer was not created for incremental analysis, or was already finalized.")
+        if len(self._stream) == 0:
+            raise ValueError("Keypoints data cannot be empty.")
+        self._sync_stream()
+        self._stream = None
+        return self.analyze()
@@ -1,6 +1,10 @@
 # ml_service/analyzers/jump_analyzer.py
+import numpy as np
 from .base_analyzer import BaseAnalyzer
-from mediapipe.python.solutions import pose as mp_pose
+from utils.landmarks import PoseLandmark
+from utils.math_utils import hysteresis_crossings
+from utils.model_registry import get_model_registry
+from utils.pose_sequence import Y
 
 class JumpAnalyzer(BaseAnalyzer):
     """Analyzes jump performance by calculating jump height and counting repetitions from pose landmarks."""
@@ -8,7 +12,7 @@ class JumpAnalyzer(BaseAnalyzer):
     def analyze(self) -> dict:
         print("Analyzing jump...")
         
-        if not self.landmarks or not any(self.landmarks):
+        if self.pose.num_valid == 0:
             return {
                 "approved": False,
                 "score": 0,
@@ -17,12 +21,12 @@ class JumpAnalyzer(BaseAnalyzer):
             }
         
         # Use the hip landmark as a proxy for the center of mass
-        hip_y_index = mp_pose.PoseLandmark.LEFT_HIP.value
+        hip_y_index = PoseLandmark.LEFT_HIP.value
         
-        # Filter out frames where the hip landmark is not detected
-        valid_landmarks = [lm[hip_y_index].y for lm in self.landmarks if lm and lm[hip_y_index]]
+        # Vertical hip position in every frame where a pose was detected
+        valid_landmarks = self.pose.features.track(hip_y_index, Y)
         
-        if not valid_landmarks:
+        if not valid_landmarks.size:
             return {
                 "approved": False,
                 "score": 0,
@@ -30,35 +34,30 @@ class JumpAnalyzer(BaseAnalyzer):
                 "metrics": {}
             }
         
-        # Find the starting position (at rest) and detect jumps
-        min_y_per_jump = []
-        max_y_per_jump = []
-        is_jumping = False
+        # Find the starting position (at rest) and detect jumps: a jump starts with
+        # downward motion past the start and ends once the hip rises above it.
         start_y = valid_landmarks[0]
-        
-        for y_coord in valid_landmarks:
-            # Detect downward movement (start of a jump)
-            if not is_jumping and y_coord > start_y + 0.05: # Threshold for downward motion
-                is_jumping = True
-                max_y_per_jump.append(y_coord)
-            
-            # Detect upward movement (end of a jump)
-            if is_jumping and y_coord < start_y - 0.05: # Threshold for upward motion
-                is_jumping = False
-                min_y_per_jump.append(y_coord)
+        jump_ends, _ = hysteresis_crossings(valid_landmarks, start_y + 0.05, start_y - 0.05)
+        min_y_per_jump = valid_landmarks[jump_ends]
         
         number_of_jumps = len(min_y_per_jump)
         
         max_jump_height_cm = 0
         if number_of_jumps > 0:
             # Calculate the height for each detected jump
-            jump_heights_normalized = [start_y - min_y for min_y in min_y_per_jump]
-            max_jump_height_normalized = max(jump_heights_normalized)
-            
-            # Use a placeholder conversion factor. This should be calibrated with real-world data.
-            # Assuming 1 normalized unit of vertical displacement is roughly 100 cm.
-            conversion_factor = 100 
-            max_jump_height_cm = round(max_jump_height_normalized * conversion_factor, 2)
+            jump_heights_normalized = start_y - min_y_per_jump
+            max_jump_height_normalized = float(jump_heights_normalized.max())
+
+            # The trained predictor takes one row per jump: hip rise, resting hip height and peak hip height.
+            features = np.column_stack((jump_heights_normalized, np.full(number_of_jumps, start_y), min_y_per_jump))
+            predicted_heights_cm = get_model_registry().predict("jump_height", features)
+            if predicted_heights_cm is not None:
+                max_jump_height_cm = round(float(np.max(predicted_heights_cm)), 2)
+            else:
+                # Use a placeholder conversion factor. This should be calibrated with real-world data.
+                # Assuming 1 normalized unit of vertical displacement is roughly 100 cm.
+                conversion_factor = 100
+                max_jump_height_cm = round(max_jump_height_normalized * conversion_factor, 2)
 
         # Scoring logic: combination of number of jumps and max height
         score = min(100, max(0, int(max_jump_height_cm * 2) + number_of_jumps * 5))
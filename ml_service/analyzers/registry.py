@@ -0,0 +1,35 @@
+import importlib
+import threading
+from collections.abc import Mapping
+
+
+class AnalyzerRegistry(Mapping):
+    """
+    Maps test types to analyzer classes, given as "module:ClassName" strings.
+    An analyzer's module is only imported the first time its test type is
+    looked up, so starting the service doesn't pay for every analyzer.
+    """
+
+    def __init__(self, entries: dict[str, str]):
+        self._entries = dict(entries)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, test_type: str):
+        analyzer_class = self._loaded.get(test_type)
+        if analyzer_class is None:
+            module_name, _, class_name = self._entries[test_type].partition(":")
+            with self._lock:
+                analyzer_class = getattr(importlib.import_module(module_name), class_name)
+                self._loaded[test_type] = analyzer_class
+        return analyzer_class
+
+    def __contains__(self, test_type) -> bool:
+        # Answered from the table alone, without importing the analyzer.
+        return test_type in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
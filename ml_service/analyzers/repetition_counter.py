@@ -1,3 +1,5 @@
+from utils.math_utils import hysteresis_crossings
+
 class RepetitionCounter:
     """A class to count repetitions based on the vertical movement of a keypoint."""
 
@@ -17,4 +19,17 @@ class RepetitionCounter:
             elif self.state == "down" and y_coord < self.exit_threshold:
                 self.state = "up"
                 self.count += 1
-        return self.count
\ No newline at end of file
+        return self.count
+
+    def update_batch(self, y_coords):
+        """
+        Update the counter with the tracked landmark's y-coordinates for many
+        frames at once, e.g. `pose.landmark(index)[:, Y]`. Same result as
+        calling `update` once per frame.
+        """
+        completed, still_down = hysteresis_crossings(
+            y_coords, self.enter_threshold, self.exit_threshold, entered=self.state == "down"
+        )
+        self.count += len(completed)
+        self.state = "down" if still_down else "up"
+        return self.count
@@ -1,15 +1,27 @@
 # ml_service/analyzers/shuttle_run_analyzer.py
 from .base_analyzer import BaseAnalyzer
 import numpy as np
-import time
+from utils.landmarks import PoseLandmark
+from utils.math_utils import hysteresis_crossings, motion_onset_ms, projected_crossing_ms
+from utils.pose_sequence import X
+
+# The test is 4 legs of 10 m between two lines.
+SHUTTLE_LEGS = 4
+SHUTTLE_LEG_METRES = 10.0
+# How far past the line, as a fraction of a leg, the hip has to be to count as off it or back at it.
+_LINE_MARGIN = 0.05
+# The stretch of the first leg that is fitted to find when the athlete set off, and of the last leg
+# whose pace carries the time on to the line.
+_ACCELERATION_FIT_PROGRESS = 0.3
+_FINISH_PACE_PROGRESS = 0.3
 
 class ShuttleRunAnalyzer(BaseAnalyzer):
     """Analyzes 4x10m shuttle run performance by tracking horizontal movement."""
 
     def analyze(self) -> dict:
         print("Analyzing shuttle run...")
-        
-        if not self.landmarks or not self.landmarks[0]:
+
+        if self.pose.num_valid < 2:
             return {
                 "approved": False,
                 "score": 0,
@@ -17,59 +29,63 @@ class ShuttleRunAnalyzer(BaseAnalyzer):
                 "metrics": {}
             }
 
-        start_time = time.time()
-        turns = 0
-        current_direction = None # 'right' or 'left'
-        
-        # Simplified start position from the first frame
-        start_x = self.landmarks[0][mp_pose.PoseLandmark.LEFT_HIP.value].x
-        
-        for frame_landmarks in self.landmarks:
-            if not frame_landmarks:
-                continue
+        # Hip position across the course, as progress from the starting line (0) to the far line (1).
+        hip_x = self.pose.features.track(PoseLandmark.LEFT_HIP.value, X)
+        timestamps_ms = self.pose.features.timestamps_ms
+        near, far = np.percentile(hip_x, [2, 98])
+        if far - near < 0.1:
+            return {
+                "approved": False,
+                "score": 0,
+                "feedback": "No running was detected. Keep both lines of the course in view.",
+                "metrics": {}
+            }
+        progress = (hip_x - near) / (far - near)
+        if progress[0] > 0.5:
+            progress = 1.0 - progress
+
+        # A leg is complete on reaching the opposite line; hysteresis keeps jitter near a line from counting twice.
+        # Arrivals at the far line are entries above 0.8, arrivals back at the start are the exits below 0.2.
+        far_arrivals, _ = hysteresis_crossings(1.0 - progress, 0.8, 0.2, entered=True)
+        start_arrivals, _ = hysteresis_crossings(progress, 0.8, 0.2)
+        leg_ends = np.sort(np.concatenate((far_arrivals, start_arrivals)))
+        turns = max(0, min(len(leg_ends), SHUTTLE_LEGS) - 1)
+
+        # Timed from the moment the athlete set off, extrapolated back along their acceleration off the
+        # line, to the hip reaching the start line again at the pace of the last leg's run-in.
+        # Both are interpolated between frames so frame skipping doesn't shift the result.
+        start_ms = motion_onset_ms(progress, timestamps_ms, _LINE_MARGIN, _ACCELERATION_FIT_PROGRESS)
+        finish_ms = None
+        if len(leg_ends) >= SHUTTLE_LEGS:
+            finishing_leg_end = leg_ends[SHUTTLE_LEGS - 1]
+            finish_ms = projected_crossing_ms(-progress, timestamps_ms, 0.0, -_LINE_MARGIN, -_FINISH_PACE_PROGRESS,
+                                              start=leg_ends[SHUTTLE_LEGS - 2])
+            if finish_ms is None:
+                finish_ms = float(timestamps_ms[finishing_leg_end])
+
+        if finish_ms is None or start_ms is None:
+            return {
+                "approved": False,
+                "score": 0,
+                "feedback": f"Foul: Only {turns} turns were detected. You must complete 4x10m.",
+                "metrics": {
+                    "turns_detected": turns
+                }
+            }
 
-            hip_x = frame_landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x
-            
-            # This is a very basic turn detection based on direction change
-            if current_direction is None:
-                if hip_x > start_x:
-                    current_direction = 'right'
-                elif hip_x < start_x:
-                    current_direction = 'left'
-            else:
-                if current_direction == 'right' and hip_x < start_x:
-                    turns += 1
-                    current_direction = 'left'
-                elif current_direction == 'left' and hip_x > start_x:
-                    turns += 1
-                    current_direction = 'right'
-            
-            # In a real scenario, you'd check if the hip landmark crosses a virtual line
-            # at each end of the 10m course.
-            
-        end_time = time.time()
-        
-        # Mocking values for demonstration
-        mock_time_seconds = end_time - start_time
-        
-        # Scoring based on time and number of turns
-        expected_turns = 3
-        
-        if turns < expected_turns:
-            feedback = f"Foul: Only {turns} turns were detected. You must complete 4x10m."
-            approved = False
-        else:
-            feedback = f"Great run! Time: {mock_time_seconds:.2f} seconds."
-            approved = True
+        time_taken_seconds = (finish_ms - start_ms) / 1000.0
+        average_speed_mps = SHUTTLE_LEGS * SHUTTLE_LEG_METRES / time_taken_seconds
 
-        score = max(0, 100 - (mock_time_seconds * 5)) # Example scoring
+        # Example scoring: full marks at 9 s or faster, nothing at 15 s or slower.
+        score = min(100, max(0, (15.0 - time_taken_seconds) * 100 / 6))
 
         return {
-            "approved": approved,
+            "approved": True,
             "score": int(score),
-            "feedback": feedback,
+            "feedback": f"Great run! Time: {time_taken_seconds:.2f} seconds.",
             "metrics": {
-                "time_taken_seconds": round(mock_time_seconds, 2),
-                "turns_detected": turns
+                "time_taken_seconds": round(time_taken_seconds, 2),
+                "turns_detected": turns,
+                "average_speed_mps": round(average_speed_mps, 2)
             }
-        }
\ No newline at end of file
+        }
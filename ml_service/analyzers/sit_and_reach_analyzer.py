@@ -1,6 +1,7 @@
 # ml_service/analyzers/sit_and_reach_analyzer.py
 from .base_analyzer import BaseAnalyzer
-from mediapipe.python.solutions import pose as mp_pose
+from utils.landmarks import PoseLandmark
+from utils.pose_sequence import X
 
 class SitAndReachAnalyzer(BaseAnalyzer):
     """Analyzes the Sit and Reach Test for flexibility."""
@@ -8,7 +9,7 @@ class SitAndReachAnalyzer(BaseAnalyzer):
     def analyze(self) -> dict:
         print("Analyzing Sit and Reach Test...")
 
-        if not self.landmarks or len(self.landmarks) < 2:
+        if self.pose.num_valid < 2:
             return {
                 "approved": False,
                 "score": 0,
@@ -22,28 +23,23 @@ class SitAndReachAnalyzer(BaseAnalyzer):
         # and measure the horizontal displacement of the wrists from that point.
         
         # Use the wrists as the keypoints for the reach
-        wrist_left = mp_pose.PoseLandmark.LEFT_WRIST.value
-        wrist_right = mp_pose.PoseLandmark.RIGHT_WRIST.value
+        wrist_left = PoseLandmark.LEFT_WRIST.value
+        wrist_right = PoseLandmark.RIGHT_WRIST.value
         
         # Use the feet as the zero-point reference
-        ankle_left = mp_pose.PoseLandmark.LEFT_ANKLE.value
-        ankle_right = mp_pose.PoseLandmark.RIGHT_ANKLE.value
+        ankle_left = PoseLandmark.LEFT_ANKLE.value
+        ankle_right = PoseLandmark.RIGHT_ANKLE.value
         
         # Find the max forward displacement (min x-coordinate)
-        max_reach_metric = 0
-        for frame_landmarks in self.landmarks:
-            if not frame_landmarks or not frame_landmarks[wrist_left] or not frame_landmarks[wrist_right]:
-                continue
-                
-            # Get the wrist and ankle x-coordinates
-            wrist_x = (frame_landmarks[wrist_left].x + frame_landmarks[wrist_right].x) / 2
-            ankle_x = (frame_landmarks[ankle_left].x + frame_landmarks[ankle_right].x) / 2
-            
-            # Calculate the reach relative to the ankles
-            reach_displacement = ankle_x - wrist_x
-            
-            if reach_displacement > max_reach_metric:
-                max_reach_metric = reach_displacement
+        features = self.pose.features
+
+        # Get the wrist and ankle x-coordinates
+        wrist_x = features.midpoint(wrist_left, wrist_right, X)
+        ankle_x = features.midpoint(ankle_left, ankle_right, X)
+        
+        # Calculate the reach relative to the ankles
+        reach_displacement = ankle_x - wrist_x
+        max_reach_metric = max(0.0, float(reach_displacement.max()))
                 
         # Scoring based on reach
         # This will require calibration to actual physical measurements.
@@ -1,8 +1,8 @@
 # ml_service/analyzers/sit_up_analyzer.py
-from mediapipe.python.solutions import pose as mp_pose
+from utils.landmarks import PoseLandmark
 from .base_analyzer import BaseAnalyzer
 from .repetition_counter import RepetitionCounter
-from utils.math_utils import calculate_angle
+from utils.pose_sequence import Y
 
 class SitUpAnalyzer(BaseAnalyzer):
     """Analyzes sit-up performance for repetitions and form."""
@@ -11,23 +11,19 @@ class SitUpAnalyzer(BaseAnalyzer):
         print("Analyzing sit-ups...")
         
         # We'll use the shoulder as the primary landmark for counting reps
-        shoulder = mp_pose.PoseLandmark.LEFT_SHOULDER.value
+        shoulder = PoseLandmark.LEFT_SHOULDER.value
         
         # Initialize repetition counter based on shoulder movement
         # Thresholds are based on normalized y-coordinates.
         # This will need to be calibrated with real data.
         counter = RepetitionCounter(shoulder, enter_threshold=0.6, exit_threshold=0.3)
 
-        reps = 0
         form_ok = True
         
-        # You'd iterate through landmarks to update the counter and check form
-        # For simplicity, we'll mock the reps and form check
-        for frame_landmarks in self.landmarks:
-            current_reps = counter.update(frame_landmarks)
-            # You would add form validation here, e.g., checking the knee angle
-            # at the start/end of a repetition to ensure it stays bent.
-            reps = current_reps
+        # Count reps over the shoulder track of the whole sequence at once
+        # You would add form validation here, e.g., checking the knee angle
+        # at the start/end of a repetition to ensure it stays bent.
+        reps = counter.update_batch(self.pose.features.track(shoulder, Y))
 
         feedback_messages = []
         if reps == 0:
@@ -1,14 +1,33 @@
 # ml_service/analyzers/sprint_analyzer.py
 from .base_analyzer import BaseAnalyzer
 import numpy as np
+from utils.landmarks import PoseLandmark
+from utils.math_utils import motion_onset_ms, projected_crossing_ms
+from utils.pose_sequence import X
+
+# The sprint distance the camera covers, start line at one edge of the run and finish at the other.
+SPRINT_DISTANCE_METRES = 40.0
+# Window for smoothing hip velocity before taking the top speed.
+_SPEED_SMOOTHING_MS = 300.0
+# Progress at which the run counts as started and finished; kept off 0 and 1 so jitter at rest doesn't trigger them.
+_START_PROGRESS = 0.02
+_FINISH_PROGRESS = 0.98
+# The stretch of the start that is fitted to find when the athlete set off, and of the finish
+# whose pace carries the time on to the line.
+_ACCELERATION_FIT_PROGRESS = 0.15
+_FINISH_PACE_PROGRESS = 0.9
 
 class SprintAnalyzer(BaseAnalyzer):
-    """Analyzes sprint performance. Placeholder implementation."""
+    """
+    Analyzes sprint performance from a static side-on video that covers the
+    whole distance. The hip's horizontal travel across the frame is scaled to
+    SPRINT_DISTANCE_METRES, and times come from the frame timestamps.
+    """
 
     def analyze(self) -> dict:
         print("Analyzing sprint...")
-        
-        if not self.landmarks or len(self.landmarks) < 2:
+
+        if self.pose.num_valid < 2:
             return {
                 "approved": False,
                 "score": 0,
@@ -16,21 +35,42 @@ class SprintAnalyzer(BaseAnalyzer):
                 "metrics": {}
             }
 
-        # In a real implementation, you would calculate:
-        # 1. Total time: based on frames and FPS of the video.
-        # 2. Distance: by tracking the horizontal movement of a keypoint (e.g., hip).
-        # 3. Speed: distance / time.
-        
-        # We will use mock data for demonstration
-        mock_time_seconds = 6.2 # Example time for a 40m dash
-        mock_estimated_speed_kmh = 23.0
-        
+        features = self.pose.features
+        hips = (PoseLandmark.LEFT_HIP.value, PoseLandmark.RIGHT_HIP.value)
+        timestamps_ms = features.timestamps_ms
+        hip_x = features.midpoint(*hips, X)
+
+        # Progress along the run, from the starting position (0) to the furthest point reached (1).
+        direction = 1.0 if hip_x[-1] >= hip_x[0] else -1.0
+        travel = direction * (hip_x - hip_x[0])
+        span = float(travel.max())
+        if span < 0.2:
+            return {
+                "approved": False,
+                "score": 0,
+                "feedback": "Not enough movement detected. Keep the whole sprint in view.",
+                "metrics": {}
+            }
+        progress = travel / span
+
+        # Timed from the moment the athlete set off, extrapolated back along the acceleration out of the
+        # blocks, to the hip reaching the finish at the pace of the last stretch. Both are interpolated
+        # between frames, so they don't depend on which frames were sampled.
+        start_ms = motion_onset_ms(progress, timestamps_ms, _START_PROGRESS, _ACCELERATION_FIT_PROGRESS)
+        finish_ms = projected_crossing_ms(progress, timestamps_ms, 1.0, _FINISH_PROGRESS, _FINISH_PACE_PROGRESS)
+        time_seconds = (finish_ms - start_ms) / 1000.0
+        metres_per_unit = SPRINT_DISTANCE_METRES / span
+
+        speeds = features.speed(hips, X, _SPEED_SMOOTHING_MS) * metres_per_unit
+        top_speed_kmh = float(speeds.max()) * 3.6 if speeds.size else 0.0
+        average_speed_kmh = SPRINT_DISTANCE_METRES / time_seconds * 3.6 if time_seconds > 0 else 0.0
+
         # A simple score based on speed
-        score = min(100, max(0, int(mock_estimated_speed_kmh * 4)))
+        score = min(100, max(0, int(top_speed_kmh * 4)))
 
         feedback = "Excellent stride frequency and speed."
         approved = True
-        if mock_time_seconds > 8:
+        if time_seconds > 8:
             feedback = "Good sprint, but there's room for improvement on speed."
             approved = False
 
@@ -39,7 +79,8 @@ class SprintAnalyzer(BaseAnalyzer):
             "score": score,
             "feedback": feedback,
             "metrics": {
-                "estimated_top_speed_kmh": round(mock_estimated_speed_kmh, 2),
-                "time_taken_seconds": round(mock_time_seconds, 2)
+                "estimated_top_speed_kmh": round(top_speed_kmh, 2),
+                "average_speed_kmh": round(average_speed_kmh, 2),
+                "time_taken_seconds": round(time_seconds, 2)
             }
-        }
\ No newline at end of file
+        }
@@ -1,44 +1,50 @@
 # ml_service/analyzers/squat_analyzer.py
-from mediapipe.python.solutions import pose as mp_pose
+import numpy as np
+from utils.landmarks import PoseLandmark
 from .base_analyzer import BaseAnalyzer
 from .repetition_counter import RepetitionCounter
-from utils.math_utils import calculate_angle
+from utils.model_registry import get_model_registry
+from utils.pose_sequence import X, Y
 
 class SquatAnalyzer(BaseAnalyzer):
     """Analyzes squat performance for repetitions and form."""
 
     def analyze(self) -> dict:
-        hip = mp_pose.PoseLandmark.LEFT_HIP.value
-        knee = mp_pose.PoseLandmark.LEFT_KNEE.value
-        ankle = mp_pose.PoseLandmark.LEFT_ANKLE.value
-        shoulder = mp_pose.PoseLandmark.LEFT_SHOULDER.value
+        hip = PoseLandmark.LEFT_HIP.value
+        knee = PoseLandmark.LEFT_KNEE.value
+        ankle = PoseLandmark.LEFT_ANKLE.value
+        shoulder = PoseLandmark.LEFT_SHOULDER.value
 
         counter = RepetitionCounter(hip, enter_threshold=0.7, exit_threshold=0.6)
 
-        min_knee_angle = 180.0
-        max_back_angle = 0.0
         feedback_messages = []
 
-        for frame_landmarks in self.landmarks:
-            if not frame_landmarks or not frame_landmarks[hip] or not frame_landmarks[knee] or not frame_landmarks[ankle]:
-                continue
-            
-            counter.update(frame_landmarks)
+        # All per-frame metrics are computed over the whole sequence at once,
+        # and shared with any other test run on the same sequence.
+        features = self.pose.features
+        hip_y = features.track(hip, Y)
+        counter.update_batch(hip_y)
 
-            # Calculate knee angle for depth
-            knee_angle = calculate_angle(
-                (frame_landmarks[hip].x, frame_landmarks[hip].y),
-                (frame_landmarks[knee].x, frame_landmarks[knee].y),
-                (frame_landmarks[ankle].x, frame_landmarks[ankle].y)
-            )
-            min_knee_angle = min(min_knee_angle, knee_angle)
+        # Calculate knee angle for depth
+        knee_angles = features.angle(hip, knee, ankle)
+        measured = ~np.isnan(knee_angles)
+        min_knee_angle = min(180.0, float(knee_angles[measured].min())) if measured.any() else 180.0
 
-            # Calculate back angle (hip-shoulder relative to vertical) for posture
-            # Simplified approach: horizontal distance between hip and shoulder
-            hip_x = frame_landmarks[hip].x
-            shoulder_x = frame_landmarks[shoulder].x
-            back_lean_metric = abs(hip_x - shoulder_x) * 100 
-            max_back_lean_metric = max(max_back_angle, back_lean_metric)
+        # Calculate back angle (hip-shoulder relative to vertical) for posture
+        # Simplified approach: horizontal distance between hip and shoulder
+        back_lean_metrics = np.abs(features.track(hip, X) - features.track(shoulder, X)) * 100
+        max_back_lean_metric = float(back_lean_metrics.max()) if back_lean_metrics.size else 0.0
+
+        # The trained form corrector scores every frame in one batch, from its knee angle,
+        # forward lean and hip height, with the probability that the form is off.
+        form_error_rate = None
+        if measured.any():
+            form_features = np.column_stack((knee_angles, back_lean_metrics, hip_y))[measured]
+            form_errors = get_model_registry().predict("squat_form", form_features)
+            if form_errors is not None:
+                form_error_rate = float(np.mean(np.ravel(form_errors) > 0.5))
+                if form_error_rate > 0.3:
+                    feedback_messages.append("Your form slipped on several reps; control the descent.")
 
 
         # Scoring and Feedback Logic
@@ -67,6 +73,7 @@ class SquatAnalyzer(BaseAnalyzer):
             "metrics": {
                 "repetitions": reps,
                 "min_knee_angle": round(min_knee_angle, 2),
-                "max_forward_lean_metric": round(max_back_lean_metric, 2)
+                "max_forward_lean_metric": round(max_back_lean_metric, 2),
+                **({"form_error_rate": round(form_error_rate, 2)} if form_error_rate is not None else {})
             }
         }
\ No newline at end of file
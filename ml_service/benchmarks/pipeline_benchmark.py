@@ -0,0 +1,259 @@
+"""
+Times every stage of the analysis pipeline offline: download (from a local
+HTTP stand-in), decode, pose extraction, each analyzer and webhook delivery.
+Reports throughput, p50/p95 latency and peak RSS, and saves them as JSON so
+runs on different commits can be compared.
+
+Run from the ml_service directory:
+    python -m benchmarks.pipeline_benchmark --output results.json
+    python -m benchmarks.pipeline_benchmark --compare results.json
+
+Extraction is skipped if the pose model bundle isn't on disk.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from benchmarks.analyzer_benchmark import ANALYZERS, synthetic_pose_sequence
+from utils import pose_estimation, video_processing, webhook_dispatcher
+from utils.pose_sequence import PoseSequence
+
+
+# --- Synthetic Inputs ---
+def synthetic_video(path: str, seconds: float, fps: float = 30.0, size: tuple = (640, 480)) -> str:
+    """Writes a clip of a stick figure squatting in place, so decode and inference see realistic motion."""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(int(seconds * fps)):
+        frame = np.full((height, width, 3), 60, dtype=np.uint8)
+        depth = int(0.15 * height * (1 - np.cos(2 * np.pi * 0.5 * i / fps)) / 2)
+        cx, hip_y = width // 2, int(0.55 * height) + depth
+        head_y, knee_y, foot_y = int(0.2 * height) + depth, int(0.75 * height) + depth // 2, int(0.92 * height)
+        cv2.circle(frame, (cx, head_y), height // 20, (220, 200, 180), -1)
+        cv2.line(frame, (cx, head_y), (cx, hip_y), (220, 200, 180), 12)
+        for side in (-1, 1):
+            cv2.line(frame, (cx, head_y + height // 10), (cx + side * width // 8, hip_y - height // 20), (220, 200, 180), 8)
+            cv2.line(frame, (cx, hip_y), (cx + side * width // 14, knee_y), (220, 200, 180), 10)
+            cv2.line(frame, (cx + side * width // 14, knee_y), (cx + side * width // 16, foot_y), (220, 200, 180), 10)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+# --- Local HTTP Stand-in ---
+class _StandIn(BaseHTTPRequestHandler):
+    """Serves the synthetic video (with Range support) and accepts webhook POSTs."""
+
+    video = b""
+    received = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body, status = self.video, 200
+        if self.headers.get("Range", "").startswith("bytes="):
+            start = int(self.headers["Range"][6:].split("-")[0])
+            body, status = self.video[start:], 206
+        self.send_response(status)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {len(self.video) - len(body)}-{len(self.video) - 1}/{len(self.video)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.received.append(time.perf_counter() - payload["sent_at"])
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def _start_stand_in(video: bytes) -> ThreadingHTTPServer:
+    _StandIn.video = video
+    _StandIn.received = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- Measurement ---
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024**2 if platform.system() == "Darwin" else 1024)
+
+
+def summarize(samples: list, items_per_sample: float, unit: str) -> dict:
+    """Latency percentiles for a list of per-run wall times in seconds, plus throughput in `unit`/s."""
+    samples = np.asarray(samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(samples, 95)) * 1000, 3),
+        "mean_ms": round(float(samples.mean()) * 1000, 3),
+        "throughput": round(items_per_sample / float(np.median(samples)), 2),
+        "throughput_unit": f"{unit}/s",
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _time(fn, repeats: int) -> list:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# --- Stages ---
+def bench_download(url: str, size_bytes: int, folder: str, repeats: int) -> dict:
+    def download():
+        video_processing.cleanup_file(video_processing.download_video(url, folder))
+    return summarize(_time(download, repeats), size_bytes / 1e6, "MB")
+
+
+def bench_decode(path: str, frames: int, repeats: int) -> dict:
+    def decode():
+        for _ in pose_estimation.iter_decoded_frames(cv2.VideoCapture(path)):
+            pass
+    return summarize(_time(decode, repeats), frames, "frames")
+
+
+def bench_extract(path: str, frames: int, repeats: int, model_variant: str) -> dict:
+    model_path = pose_estimation.MODEL_ASSET_PATHS[model_variant]
+    if not os.path.exists(model_path):
+        return {"skipped": f"Pose model '{model_path}' not found."}
+    # Load and warm the model outside the timed runs, as the workers do at startup.
+    pose_estimation.init_landmarker_pool(model_variant)
+    return summarize(
+        _time(lambda: pose_estimation.extract_keypoints_from_video(path, model_variant=model_variant), repeats),
+        frames, "frames")
+
+
+def bench_analyzers(minutes: float, fps: float, repeats: int) -> dict:
+    pose = synthetic_pose_sequence(int(minutes * 60 * fps), fps)
+
+    def analyze(analyzer_class):
+        # A fresh sequence over the same arrays (no copy), so derived features aren't reused between runs.
+        analyzer_class(PoseSequence(pose.keypoints, pose.valid, pose.timestamps_ms, pose.fps)).analyze()
+
+    return {
+        test_type: summarize(_time(lambda: analyze(analyzer_class), repeats), len(pose), "frames")
+        for test_type, analyzer_class in ANALYZERS.items()
+    }
+
+
+def bench_webhooks(url: str, folder: str, deliveries: int) -> dict:
+    """Delivery latency from enqueue to receipt through the outbox and dispatcher."""
+    outbox = os.path.join(folder, "outbox.db")
+    dispatcher = webhook_dispatcher.WebhookDispatcher(path=outbox)
+    dispatcher.start()
+    start = time.perf_counter()
+    for i in range(deliveries):
+        webhook_dispatcher.enqueue(url, {"sent_at": time.perf_counter(), "index": i}, path=outbox)
+    while len(_StandIn.received) < deliveries and time.perf_counter() - start < 60:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    dispatcher.stop()
+    result = summarize(_StandIn.received, 1, "deliveries")
+    result["throughput"] = round(len(_StandIn.received) / elapsed, 2)
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(video_seconds: float, pose_minutes: float, fps: float, repeats: int, model_variant: str) -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+        path = synthetic_video(os.path.join(folder, "synthetic.mp4"), video_seconds, fps)
+        with open(path, "rb") as f:
+            video = f.read()
+        frames = int(video_seconds * fps)
+        server = _start_stand_in(video)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            stages = {
+                "download": bench_download(f"{base_url}/video.mp4", len(video), folder, repeats),
+                "decode": bench_decode(path, frames, repeats),
+                "extract_keypoints": bench_extract(path, frames, repeats, model_variant),
+                "analyzers": bench_analyzers(pose_minutes, fps, repeats),
+                "webhook": bench_webhooks(f"{base_url}/webhook", folder, deliveries=repeats * 10),
+            }
+        finally:
+            server.shutdown()
+            pose_estimation.close_landmarker_pool()
+
+    return {
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {"video_seconds": video_seconds, "pose_minutes": pose_minutes, "fps": fps,
+                     "repeats": repeats, "model_variant": model_variant},
+        "stages": stages,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _flatten(stages: dict, prefix: str = "") -> dict:
+    flat = {}
+    for name, value in stages.items():
+        if "p50_ms" in value:
+            flat[prefix + name] = value
+        elif "skipped" not in value:
+            flat.update(_flatten(value, f"{prefix}{name}."))
+    return flat
+
+
+def print_report(results: dict, baseline: dict | None = None):
+    current = _flatten(results["stages"])
+    previous = _flatten(baseline["stages"]) if baseline else {}
+    for name, stage in current.items():
+        line = (f"{name:>24}: p50 {stage['p50_ms']:9.2f} ms  p95 {stage['p95_ms']:9.2f} ms  "
+                f"{stage['throughput']:10.1f} {stage['throughput_unit']}")
+        if name in previous:
+            line += f"  ({stage['p50_ms'] / previous[name]['p50_ms']:.2f}x p50 vs {baseline.get('commit') or 'baseline'})"
+        print(line)
+    print(f"{'peak RSS':>24}: {results['peak_rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video-seconds", type=float, default=10.0, help="Length of the synthetic video.")
+    parser.add_argument("--pose-minutes", type=float, default=5.0, help="Length of the synthetic pose sequence for the analyzers.")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the synthetic inputs.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per stage.")
+    parser.add_argument("--model-variant", default=pose_estimation.DEFAULT_MODEL_VARIANT, help="Pose model to extract with.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A results file from an earlier run to compare p50 latencies against.")
+    args = parser.parse_args()
+
+    results = run(args.video_seconds, args.pose_minutes, args.fps, args.repeats, args.model_variant)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
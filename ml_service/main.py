@@ -1,7 +1,13 @@
+import functools
+import hashlib
 import os
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Header
-from pydantic import BaseModel, HttpUrl
-import requests
+import struct
+import threading
+from contextlib import asynccontextmanager
+from typing import Literal
+from fastapi import FastAPI, HTTPException, Header, Response, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, HttpUrl
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -9,22 +15,44 @@ load_dotenv()
 
 # Import utilities and analyzers
 from utils import video_processing, pose_estimation
-from analyzers.squat_analyzer import SquatAnalyzer
-from analyzers.jump_analyzer import JumpAnalyzer
-from analyzers.sprint_analyzer import SprintAnalyzer
-from analyzers.sit_up_analyzer import SitUpAnalyzer
-from analyzers.shuttle_run_analyzer import ShuttleRunAnalyzer
-from analyzers.standing_broad_jump_analyzer import StandingBroadJumpAnalyzer
-from analyzers.sit_and_reach_analyzer import SitAndReachAnalyzer # New import
+from utils.job_queue import JobQueue, QueueFullError
+from utils.keypoint_cache import get_keypoint_cache
+from utils import webhook_dispatcher, metrics
+from analyzers.registry import AnalyzerRegistry
 
 # --- App Initialization ---
+job_queue: JobQueue | None = None
+dispatcher: webhook_dispatcher.WebhookDispatcher | None = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global job_queue, dispatcher
+    # Jobs killed mid-download never reached their cleanup; clear what they left behind.
+    video_processing.sweep_stale_temp_files()
+    # Webhooks queued by workers are delivered from this process; start first so
+    # deliveries left over from a previous run go out straight away.
+    dispatcher = webhook_dispatcher.WebhookDispatcher()
+    dispatcher.start()
+    # Each worker process loads and warms its own pose models once, instead of on every request.
+    job_queue = JobQueue(initializer=warm_landmarker_pools)
+    metrics.track_gauges(job_queue, dispatcher)
+    yield
+    job_queue.shutdown()
+    dispatcher.stop()
+    # Only loaded here if a live stream was analyzed.
+    pose_estimation.close_landmarker_pool()
+
 app = FastAPI(
     title="Multi-Sport Analysis ML Service",
     description="An API for analyzing athletic performance from video.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+MAX_BATCH_VIDEOS = int(os.getenv("MAX_BATCH_VIDEOS", "10"))
+# How often, in stream time, a live analysis sends an updated partial result.
+STREAM_PARTIAL_INTERVAL_MS = float(os.getenv("STREAM_PARTIAL_INTERVAL_MS", "1000"))
 
 # --- Pydantic Models for Request/Response ---
 class AnalysisRequest(BaseModel):
@@ -33,81 +61,420 @@ class AnalysisRequest(BaseModel):
     test_type: str
     webhook_url: HttpUrl
     webhook_secret: str
+    # Pose model complexity; defaults to POSE_MODEL_VARIANT, or MODEL_VARIANT_MAPPING with PER_TEST_MODEL_VARIANTS.
+    model_variant: Literal["lite", "full", "heavy"] | None = None
+
+class BatchVideo(BaseModel):
+    video_url: HttpUrl
+    test_types: list[str] = Field(min_length=1)
+
+class BatchAnalysisRequest(BaseModel):
+    videos: list[BatchVideo] = Field(min_length=1, max_length=MAX_BATCH_VIDEOS)
+    sport: str
+    webhook_url: HttpUrl
+    webhook_secret: str
+    # Applies to every video in the batch; defaults to the heaviest variant any requested test needs.
+    model_variant: Literal["lite", "full", "heavy"] | None = None
 
 # --- Sport Analyzer Mapping ---
-ANALYZER_MAPPING = {
-    "squat": SquatAnalyzer,
-    "jump": JumpAnalyzer,
-    "sprint": SprintAnalyzer,
-    "sit-ups": SitUpAnalyzer,
-    "shuttle-run": ShuttleRunAnalyzer,
-    "standing-broad-jump": StandingBroadJumpAnalyzer,
-    "sit-and-reach": SitAndReachAnalyzer, # New mapping
+# Each analyzer is imported the first time its test type is requested.
+ANALYZER_MAPPING = AnalyzerRegistry({
+    "squat": "analyzers.squat_analyzer:SquatAnalyzer",
+    "jump": "analyzers.jump_analyzer:JumpAnalyzer",
+    "sprint": "analyzers.sprint_analyzer:SprintAnalyzer",
+    "sit-ups": "analyzers.sit_up_analyzer:SitUpAnalyzer",
+    "shuttle-run": "analyzers.shuttle_run_analyzer:ShuttleRunAnalyzer",
+    "standing-broad-jump": "analyzers.standing_broad_jump_analyzer:StandingBroadJumpAnalyzer",
+    "sit-and-reach": "analyzers.sit_and_reach_analyzer:SitAndReachAnalyzer",
+})
+
+# --- Frame Sampling Defaults ---
+# Slow, steady movements don't need every frame through the landmarker; skipped
+# frames are interpolated. Fast, short events (jumps, sprints) keep every frame.
+SAMPLING_POLICY_MAPPING = {
+    "squat": pose_estimation.SamplingPolicy.adaptive(max_stride=4),
+    "jump": pose_estimation.SamplingPolicy.all_frames(),
+    "sprint": pose_estimation.SamplingPolicy.all_frames(),
+    "sit-ups": pose_estimation.SamplingPolicy.adaptive(max_stride=3),
+    "shuttle-run": pose_estimation.SamplingPolicy.fixed(target_fps=30),
+    "standing-broad-jump": pose_estimation.SamplingPolicy.all_frames(),
+    "sit-and-reach": pose_estimation.SamplingPolicy.fixed(target_fps=10),
+}
+
+# --- Pose Model Defaults ---
+# Tests scored on large, slow movements run fine on the lighter model. Opt-in, since it needs
+# pose_landmarker_full.task deployed next to the heavy bundle (tests fall back to POSE_MODEL_VARIANT
+# without it). When off, or for tests not listed, every job uses POSE_MODEL_VARIANT (heavy unless configured).
+PER_TEST_MODEL_VARIANTS = os.getenv("PER_TEST_MODEL_VARIANTS", "0") == "1"
+MODEL_VARIANT_MAPPING = {
+    "squat": "full",
+    "sit-ups": "full",
+    "shuttle-run": "full",
+    "sit-and-reach": "full",
 }
 
-# --- Background Task Definition ---
-def run_analysis_and_notify(request: AnalysisRequest):
+# --- Keypoint Extraction ---
+_MODEL_VARIANT_ORDER = ["lite", "full", "heavy"]
+
+def default_model_variant(test_type: str) -> str:
+    """The model variant a test runs on unless the request asks for one."""
+    variant = MODEL_VARIANT_MAPPING.get(test_type) if PER_TEST_MODEL_VARIANTS else None
+    return pose_estimation.resolve_model_variant(variant)
+
+def warm_landmarker_pools():
+    """Worker initializer: loads a landmarker pool for every variant the tests use by default."""
+    for variant in sorted({default_model_variant(t) for t in ANALYZER_MAPPING}, key=_MODEL_VARIANT_ORDER.index):
+        pose_estimation.init_landmarker_pool(variant)
+
+def extraction_settings(test_types: list[str], model_variant: str | None = None) -> tuple:
+    """
+    Picks one set of extraction settings that serves every test in `test_types`,
+    so a video scored for several tests only goes through the landmarker once.
+    Sampling falls back to every frame when the tests disagree, and the model
+    is the heaviest any of them would use on its own.
+
+    Returns:
+        tuple: (SamplingPolicy, model variant, whether segmentation masks are needed)
+    """
+    policies = [pose_estimation.resolve_sampling_policy(SAMPLING_POLICY_MAPPING.get(t)) for t in test_types]
+    sampling = policies[0]
+    if any(repr(policy) != repr(sampling) for policy in policies):
+        sampling = pose_estimation.SamplingPolicy.all_frames()
+
+    if not model_variant:
+        variants = [default_model_variant(t) for t in test_types]
+        model_variant = max(variants, key=_MODEL_VARIANT_ORDER.index)
+    model_variant = pose_estimation.resolve_model_variant(model_variant)
+
+    masks = any(ANALYZER_MAPPING[t].requires_segmentation_masks for t in test_types)
+    return sampling, model_variant, masks
+
+def extract_keypoints(video_url: str, sampling, model_variant: str, masks: bool) -> tuple:
+    """
+    Gets the pose sequence for a video, from the keypoint cache when the same
+    video was already extracted with the same settings.
+
+    The cache is keyed by the video's content hash, so with caching enabled the
+    video is downloaded (and hashed on the way) before extraction. Otherwise
+    frames are streamed straight from the URL when possible.
+
+    Returns:
+        tuple: (PoseSequence, local video path to clean up or None)
     """
-    This function runs in the background. It downloads the video,
-    runs the appropriate analysis, and sends the results to the webhook.
+    # Masks aren't cached, so analyzers that need them always run a fresh extraction.
+    cache = get_keypoint_cache() if not masks else None
+
+    keypoints = None
+    if video_processing.STREAM_FROM_URL and cache is None:
+        # Streaming bypasses the download guards, so check the advertised size first
+        video_processing.check_remote_size(video_url)
+        keypoints = pose_estimation.extract_keypoints_from_video(video_url, sampling, model_variant, masks)
+    if keypoints:
+        return keypoints, None
+
+    # Download the whole file if we need its hash, or the stream couldn't be opened or was cut off
+    hasher = hashlib.sha256()
+    with metrics.span("download"):
+        local_video_path = video_processing.download_video(video_url, hasher=hasher)
+    if not local_video_path:
+        raise ValueError("Failed to download video from URL.")
+    try:
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(hasher.hexdigest(), model_variant, pose_estimation.MODEL_ASSET_PATHS[model_variant],
+                                       sampling, pose_estimation.INFERENCE_MAX_DIMENSION,
+                                       pose_estimation.ROI_TRACKING, pose_estimation.ROI_PADDING)
+            keypoints = cache.get(cache_key)
+        if keypoints is None:
+            keypoints = pose_estimation.extract_keypoints_from_video(local_video_path, sampling, model_variant, masks)
+            if cache_key and keypoints:
+                cache.put(cache_key, keypoints)
+    except Exception:
+        video_processing.cleanup_file(local_video_path)
+        raise
+    return keypoints, local_video_path
+
+def error_results(error: Exception) -> dict:
+    """The result payload reported for a test that could not be analyzed."""
+    if isinstance(error, video_processing.VideoRejectedError):
+        feedback = f"The video was rejected: {error}"
+    else:
+        feedback = f"An internal error occurred: {error}"
+    return {
+        "approved": False,
+        "score": 0,
+        "feedback": feedback,
+        "metrics": {},
+    }
+
+def run_analyses(video_url: str, test_types: list[str], model_variant: str | None = None) -> dict:
+    """
+    Downloads and extracts a video once and runs the analyzer of every test
+    type on the same pose sequence.
+
+    Returns:
+        dict: Results per test type. A test that fails gets an error result
+        without affecting the others.
     """
     local_video_path = None
     results = {}
+    try:
+        # 1. Route to the correct analyzers based on the 'test_type' fields
+        supported = [test_type for test_type in test_types if test_type in ANALYZER_MAPPING]
+        for test_type in test_types:
+            if test_type not in ANALYZER_MAPPING:
+                results[test_type] = error_results(ValueError(f"Test type '{test_type}' is not supported."))
+                metrics.record_event("test", test_type="unsupported", outcome="error")
+        if not supported:
+            return results
+
+        # 2. Extract pose keypoints once, or reuse them from the keypoint cache
+        keypoints, local_video_path = extract_keypoints(video_url, *extraction_settings(supported, model_variant))
+        if keypoints.num_valid == 0:
+            raise ValueError("Could not detect a person in the video.")
+
+        # 3. Run each analysis on the shared keypoints
+        for test_type in supported:
+            try:
+                with metrics.span("analysis", test_type=test_type, frames=len(keypoints)):
+                    results[test_type] = ANALYZER_MAPPING[test_type](keypoints).analyze()
+                outcome = "approved" if results[test_type]["approved"] else "not_approved"
+                print(f"Analysis complete for test '{test_type}'.")
+            except Exception as e:
+                print(f"ERROR during '{test_type}' analysis: {e}")
+                results[test_type] = error_results(e)
+                outcome = "error"
+            metrics.record_event("test", test_type=test_type, outcome=outcome)
+        return results
+
+    except Exception as e:
+        print(f"ERROR during processing: {e}")
+        for test_type in supported:
+            metrics.record_event("test", test_type=test_type, outcome="error")
+        return {**results, **{test_type: error_results(e) for test_type in supported}}
+    finally:
+        # Clean up the downloaded video file
+        if local_video_path:
+            video_processing.cleanup_file(local_video_path)
+
+def post_webhook(webhook_url: str, payload: dict):
+    """
+    Queues results for the MERN backend webhook in the durable outbox. Delivery
+    and retries happen in the API process, so the worker is free immediately.
+    """
+    webhook_dispatcher.enqueue(webhook_url, payload)
+    print(f"Queued results for webhook: {webhook_url}")
+
+# --- Worker Task Definitions ---
+def run_analysis_and_notify(request: AnalysisRequest) -> dict:
+    """
+    This function runs in an analysis worker process. It downloads the video,
+    runs the appropriate analysis, sends the results to the webhook and
+    returns them so they show up in the job status.
+    """
+    results = {}
     try:
         # Security check
         if request.webhook_secret != WEBHOOK_SECRET:
             raise PermissionError("Invalid webhook secret provided.")
 
-        # 1. Download video
-        local_video_path = video_processing.download_video(str(request.video_url))
-        if not local_video_path:
-            raise ValueError("Failed to download video from URL.")
+        results = run_analyses(str(request.video_url), [request.test_type], request.model_variant)[request.test_type]
 
-        # 2. Extract pose keypoints
-        keypoints = pose_estimation.extract_keypoints_from_video(local_video_path)
-        if not any(keypoints):
-            raise ValueError("Could not detect a person in the video.")
+    except Exception as e:
+        print(f"ERROR during processing: {e}")
+        results = error_results(e)
+    finally:
+        post_webhook(str(request.webhook_url), results)
 
-        # 3. Route to the correct analyzer based on the new 'test_type' field
-        analyzer_class = ANALYZER_MAPPING.get(request.test_type)
-        if not analyzer_class:
-            raise ValueError(f"Test type '{request.test_type}' is not supported.")
+    return results
 
-        analyzer_instance = analyzer_class(keypoints)
-        results = analyzer_instance.analyze()
-        print(f"Analysis complete for test '{request.test_type}'.")
+def run_batch_analysis_and_notify(request: BatchAnalysisRequest) -> dict:
+    """
+    Worker task for /analyze/batch. Each video is extracted once and scored for
+    all of its test types, and everything is posted to the webhook as one payload:
+    {"results": [{"video_url": ..., "test_type": ..., "approved": ..., ...}, ...]}
+    """
+    results = []
+    try:
+        # Security check
+        if request.webhook_secret != WEBHOOK_SECRET:
+            raise PermissionError("Invalid webhook secret provided.")
+
+        for video in request.videos:
+            video_url = str(video.video_url)
+            test_types = list(dict.fromkeys(video.test_types))
+            for test_type, test_results in run_analyses(video_url, test_types, request.model_variant).items():
+                results.append({"video_url": video_url, "test_type": test_type, **test_results})
 
     except Exception as e:
-        print(f"ERROR during processing: {e}")
-        results = {
-            "approved": False,
-            "score": 0,
-            "feedback": f"An internal error occurred: {e}",
-            "metrics": {},
-        }
+        print(f"ERROR during batch processing: {e}")
+        results = [
+            {"video_url": str(video.video_url), "test_type": test_type, **error_results(e)}
+            for video in request.videos for test_type in video.test_types
+        ]
     finally:
-        # 4. Post results back to the MERN backend webhook
-        try:
-            requests.post(str(request.webhook_url), json=results, timeout=15, headers={"x-webhook-secret": WEBHOOK_SECRET})
-            print(f"Successfully posted results to webhook: {request.webhook_url}")
-        except requests.exceptions.RequestException as e:
-            print(f"CRITICAL: Failed to notify webhook {request.webhook_url}. Error: {e}")
+        post_webhook(str(request.webhook_url), {"results": results})
 
-        # 5. Clean up the downloaded video file
-        if local_video_path:
-            video_processing.cleanup_file(local_video_path)
+    return {"results": results}
+
+# --- In-Flight Deduplication ---
+# The backend resends /analyze on timeouts and retries. A request for a video and test
+# that is already being analyzed joins that job instead of downloading and inferring again.
+# Keyed by URL: the content hash is only known after the download this is meant to save.
+_in_flight = {}  # (video_url, test_type, model_variant) -> {"job_id": ..., "webhook_urls": [...]}
+_in_flight_lock = threading.Lock()
+
+def notify_joined_webhooks(key: tuple, job: dict):
+    """Called when an /analyze job finishes; posts its results to the webhooks of requests that joined it."""
+    with _in_flight_lock:
+        flight = _in_flight.pop(key, None)
+    if flight is None:
+        return
+    if job["status"] == "completed":
+        results = job["result"]
+    else:
+        results = error_results(RuntimeError(job["error"] or "The analysis worker failed."))
+    # The first webhook belongs to the request that started the job; its worker posts to it.
+    for webhook_url in flight["webhook_urls"][1:]:
+        post_webhook(webhook_url, results)
 
 # --- API Endpoints ---
 @app.post("/analyze")
-async def analyze_video(request: AnalysisRequest, background_tasks: BackgroundTasks):
+async def analyze_video(request: AnalysisRequest):
     """
-    Accepts a video analysis request, adds it to a background task queue,
-    and returns an immediate confirmation response.
+    Accepts a video analysis request, adds it to the job queue,
+    and returns an immediate confirmation response with the job ID.
+    A duplicate of a request still in progress gets that job's ID, and its
+    webhook receives the same results.
+    Responds with 429 and a Retry-After header when the queue is full.
     """
-    background_tasks.add_task(run_analysis_and_notify, request)
-    return {"message": "Analysis request received and is being processed."}
+    key = (str(request.video_url), request.test_type, request.model_variant)
+    webhook_url = str(request.webhook_url)
+    # A request with a bad secret must not ride on someone else's job; it fails in its own.
+    joinable = request.webhook_secret == WEBHOOK_SECRET
+    with _in_flight_lock:
+        flight = _in_flight.get(key) if joinable else None
+        if flight is not None:
+            if webhook_url not in flight["webhook_urls"]:
+                flight["webhook_urls"].append(webhook_url)
+            metrics.record_event("analyze_request", outcome="joined")
+            print(f"Request for '{request.test_type}' on {key[0]} joined job {flight['job_id']}.")
+            return {"message": "An identical analysis is already in progress; its results will be sent to your webhook.",
+                    "job_id": flight["job_id"]}
+
+        try:
+            job_id = job_queue.submit(run_analysis_and_notify, request,
+                                      on_finished=functools.partial(notify_joined_webhooks, key) if joinable else None)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        if joinable:
+            _in_flight[key] = {"job_id": job_id, "webhook_urls": [webhook_url]}
+    metrics.record_event("analyze_request", outcome="started")
+    return {"message": "Analysis request received and is being processed.", "job_id": job_id}
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    Accepts one or more videos, each with a list of test types, as a single job.
+    Every video is downloaded and run through pose extraction once, whatever the
+    number of tests, and the combined results are posted to the webhook.
+    """
+    try:
+        job_id = job_queue.submit(run_batch_analysis_and_notify, request)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return {"message": "Batch analysis request received and is being processed.", "job_id": job_id}
+
+@app.get("/jobs/{job_id}", summary="Job Status")
+def get_job_status(job_id: str):
+    """Returns the status of an analysis job, and its results once finished."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.get("/metrics", summary="Prometheus Metrics")
+def prometheus_metrics():
+    """Queue depth, in-flight jobs, per-stage latency histograms, frame throughput, cache and test counts."""
+    body, content_type = metrics.export()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/health", summary="Health Check")
 def health_check():
     """Simple health check endpoint to confirm the service is running."""
-    return {"status": "ok", "message": "ML Service is healthy."}
\ No newline at end of file
+    return {"status": "ok", "message": "ML Service is healthy."}
+
+@app.websocket("/analyze/stream")
+async def analyze_stream(websocket: WebSocket, test_type: str,
+                         model_variant: Literal["lite", "full", "heavy"] | None = None,
+                         x_webhook_secret: str | None = Header(None)):
+    """
+    Scores a test while it is being recorded, so the result is ready moments
+    after the athlete finishes instead of after a full upload.
+
+    The client sends each frame as a binary message: an 8-byte big-endian float
+    with the capture time in ms, followed by the JPEG or PNG encoded image.
+    Capture times only need to increase from frame to frame; any origin will do,
+    e.g. time since recording started or wall-clock time like Date.now(). It
+    sends the text message "end" when the recording stops. The server replies
+    with {"type": "partial", "frames": ..., "results": ...} about every
+    STREAM_PARTIAL_INTERVAL_MS of recording and {"type": "final", "results": ...}
+    after "end". Errors are sent as {"type": "error", "detail": ...} before closing.
+
+    Inference runs in this process on a landmarker held for the whole stream;
+    when none is free the connection is closed with code 1013 (try again later).
+    """
+    if x_webhook_secret != WEBHOOK_SECRET:
+        await websocket.close(code=1008, reason="Invalid webhook secret provided.")
+        return
+    if test_type not in ANALYZER_MAPPING:
+        await websocket.close(code=1008, reason=f"Test type '{test_type}' is not supported.")
+        return
+    await websocket.accept()
+
+    _, variant, masks = extraction_settings([test_type], model_variant)
+    analyzer = ANALYZER_MAPPING[test_type]()
+    # One tracker for the whole stream, so each frame is cropped around where the athlete was last seen.
+    roi = pose_estimation.ROITracker() if pose_estimation.ROI_TRACKING else None
+    pool = await run_in_threadpool(pose_estimation.get_landmarker_pool, variant, masks)
+    try:
+        with pool.checkout(timeout=0) as landmarker:
+            first_ms = last_partial_ms = None
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("text") is not None:
+                    if message["text"].strip() == "end":
+                        break
+                    raise ValueError("Expected a binary frame or \"end\".")
+
+                data = message.get("bytes") or b""
+                if len(data) <= 8:
+                    raise ValueError("Frame messages must start with an 8-byte timestamp followed by the image.")
+                (timestamp_ms,) = struct.unpack_from(">d", data)
+                if first_ms is None:
+                    first_ms = timestamp_ms
+                video_processing.check_video_duration((timestamp_ms - first_ms) / 1000.0)
+
+                frames = await run_in_threadpool(
+                    pose_estimation.extract_keypoints_from_images, [(data[8:], timestamp_ms)], landmarker, None, roi)
+                analyzer.feed(frames)
+
+                if last_partial_ms is None or timestamp_ms - last_partial_ms >= STREAM_PARTIAL_INTERVAL_MS:
+                    last_partial_ms = timestamp_ms
+                    partial = await run_in_threadpool(analyzer.partial_result)
+                    await websocket.send_json({"type": "partial", "frames": len(analyzer.pose), "results": partial})
+
+        results = await run_in_threadpool(analyzer.finalize)
+        await websocket.send_json({"type": "final", "results": results})
+        await websocket.close()
+    except WebSocketDisconnect:
+        return
+    except TimeoutError:
+        await websocket.send_json({"type": "error", "detail": "All pose landmarkers are busy, try again shortly."})
+        await websocket.close(code=1013)
+    except Exception as e:
+        print(f"ERROR during live analysis: {e}")
+        await websocket.send_json({"type": "error", "detail": error_results(e)["feedback"]})
+        await websocket.close(code=1011)
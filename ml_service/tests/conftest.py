@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The service imports its modules from its own directory (e.g. `from utils import metrics`).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_landmarker  # noqa: E402
+from utils import pose_estimation  # noqa: E402
+
+
+@pytest.fixture
+def fake_landmarkers(monkeypatch):
+    """Swaps MediaPipe for FakeLandmarker in this process, and closes the pools it was used in afterwards."""
+    monkeypatch.setattr(pose_estimation, "_create_landmarker", fake_landmarker.create_fake_landmarker)
+    fake_landmarker.FakeLandmarker.input_shapes.clear()
+    yield fake_landmarker.FakeLandmarker
+    pose_estimation.close_landmarker_pool()
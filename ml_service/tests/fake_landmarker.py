@@ -0,0 +1,58 @@
+"""
+A stand-in for MediaPipe's PoseLandmarker and a synthetic clip for it to run on,
+so extraction can be tested without a model file. The "athlete" is a white
+rectangle on black, and the fake spreads its 33 landmarks over the rectangle's
+bounding box in whatever image it is given, with z on the same scale as x like
+MediaPipe's, so results can be checked exactly.
+"""
+import types
+
+import cv2
+import numpy as np
+
+from utils import pose_estimation
+
+
+class FakeLandmarker:
+    # Shape of every image passed to detect_for_video in this process, e.g. to tell crops from whole frames.
+    input_shapes = []
+
+    def detect_for_video(self, mp_image, timestamp_ms: int):
+        image = mp_image.numpy_view()[..., 0]
+        FakeLandmarker.input_shapes.append(image.shape)
+        ys, xs = np.nonzero(image > 128)
+        pose_landmarks = []
+        if xs.size:
+            height, width = image.shape
+            x0, x1 = xs.min() / width, (xs.max() + 1) / width
+            y0, y1 = ys.min() / height, (ys.max() + 1) / height
+            pose_landmarks = [[types.SimpleNamespace(x=x0 + (x1 - x0) * (k % 3) / 2, y=y0 + (y1 - y0) * (k // 3) / 10,
+                                                     z=x0 - x1, visibility=0.9) for k in range(33)]]
+        return types.SimpleNamespace(pose_landmarks=pose_landmarks, segmentation_masks=None)
+
+    def close(self):
+        pass
+
+
+def create_fake_landmarker(model_asset_path: str, segmentation_masks: bool = False) -> FakeLandmarker:
+    return FakeLandmarker()
+
+
+def install():
+    """Makes every landmarker this process creates a fake one. Also used as the chunk workers' initializer."""
+    pose_estimation._create_landmarker = create_fake_landmarker
+
+
+def write_clip(path: str, width: int, height: int, frames: int, fps: float = 30.0,
+               box: tuple = (40, 80), step: int = 1, start: int = 10) -> str:
+    """Writes a clip of a `box`-sized white rectangle moving `step` pixels right each frame from x=`start`."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    box_width, box_height = box
+    top = (height - box_height) // 2
+    for index in range(frames):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        left = (start + index * step) % (width - box_width)
+        frame[top:top + box_height, left:left + box_width] = 255
+        writer.write(frame)
+    writer.release()
+    return path
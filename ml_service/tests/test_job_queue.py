@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+from utils.job_queue import JobQueue
+
+
+def square(value: int) -> int:
+    return value * value
+
+
+def crash():
+    # Like an OOM kill or a native crash: the process vanishes without raising.
+    os._exit(1)
+
+
+def fail_to_start():
+    raise FileNotFoundError("pose_landmarker_heavy.task")
+
+
+def wait_for(jobs: JobQueue, job_id: str, timeout: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"Job {job_id} didn't finish within {timeout}s.")
+
+
+def test_worker_crash_fails_only_its_job():
+    jobs = JobQueue(workers=1, max_queued=4)
+    try:
+        crashed = jobs.submit(crash)
+        ordinary = jobs.submit(square, 7)
+
+        crashed_job = wait_for(jobs, crashed)
+        assert crashed_job["status"] == "failed"
+        assert "died" in crashed_job["error"]
+        ordinary_job = wait_for(jobs, ordinary)
+        assert ordinary_job["status"] == "completed" and ordinary_job["result"] == 49
+    finally:
+        jobs.shutdown()
+
+
+def test_initializer_failure_fails_jobs_instead_of_hanging(capfd):
+    jobs = JobQueue(workers=1, max_queued=4, initializer=fail_to_start)
+    try:
+        job = wait_for(jobs, jobs.submit(square, 3))
+    finally:
+        jobs.shutdown()
+
+    assert job["status"] == "failed"
+    assert "failed to start: pose_landmarker_heavy.task" in capfd.readouterr().out
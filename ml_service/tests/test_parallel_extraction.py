@@ -0,0 +1,81 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+import fake_landmarker
+from utils import pose_estimation
+from utils.pose_sequence import NUM_LANDMARKS
+from utils.shared_pose import SharedPoseBuffer
+
+FPS = 30.0
+FRAMES = 300
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    return fake_landmarker.write_clip(str(tmp_path_factory.mktemp("clips") / "clip.mp4"), 320, 240, FRAMES, FPS)
+
+
+@pytest.fixture
+def chunk_workers(fake_landmarkers, monkeypatch):
+    """Four spawned chunk workers running the fake landmarker, and chunking for anything over a second."""
+    monkeypatch.setattr(pose_estimation, "PARALLEL_EXTRACTION_WORKERS", 4)
+    monkeypatch.setattr(pose_estimation, "PARALLEL_EXTRACTION_MIN_SECONDS", 1)
+    # Torn down by close_landmarker_pool in the fake_landmarkers fixture.
+    pose_estimation._chunk_executor = ProcessPoolExecutor(4, mp_context=multiprocessing.get_context("spawn"),
+                                                          initializer=fake_landmarker.install)
+
+
+def extract_sequentially(clip, sampling, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(pose_estimation, "PARALLEL_EXTRACTION_WORKERS", 0)
+        return pose_estimation.extract_keypoints_from_video(clip, sampling)
+
+
+def assert_same_sequence(actual, expected):
+    assert len(actual) == len(expected) == FRAMES
+    np.testing.assert_array_equal(actual.valid, expected.valid)
+    np.testing.assert_allclose(actual.keypoints, expected.keypoints, atol=1e-5)
+    np.testing.assert_allclose(actual.timestamps_ms, expected.timestamps_ms, atol=1e-3)
+
+
+@pytest.mark.parametrize("spec", ["all", "fixed:10"])
+def test_chunked_extraction_matches_sequential(clip, chunk_workers, monkeypatch, spec):
+    sampling = pose_estimation.SamplingPolicy.parse(spec)
+    expected = extract_sequentially(clip, sampling, monkeypatch)
+
+    assert len(pose_estimation._plan_chunks(clip, FPS, FRAMES, False)) == 4
+    actual = pose_estimation.extract_keypoints_from_video(clip, sampling)
+
+    assert_same_sequence(actual, expected)
+
+
+def test_last_chunk_overflows_an_underestimated_frame_count(clip, chunk_workers, monkeypatch):
+    sampling = pose_estimation.SamplingPolicy.all_frames()
+    expected = extract_sequentially(clip, sampling, monkeypatch)
+
+    # As if the container claimed a third of its frames: the last chunk reads on to the end of the
+    # stream, past the shared buffer, and hands the rest back through the executor.
+    estimate = FRAMES // 3
+    chunks = pose_estimation._plan_chunks(clip, FPS, estimate, False)
+    actual = pose_estimation._extract_chunks_in_parallel(clip, chunks, FPS, estimate, sampling, None)
+
+    assert_same_sequence(actual, expected)
+
+
+def test_stitching_rebases_timestamps_that_restart():
+    keypoints = np.random.default_rng(0).random((6, NUM_LANDMARKS, 4), dtype=np.float32)
+    valid = np.array([True, True, False, True, True, True])
+    with SharedPoseBuffer.create(4) as buffer:
+        buffer.write(0, keypoints[:2], valid[:2], np.array([0.0, 100.0]))
+        # The second chunk seeked and reports its times from zero; two frames don't fit in the buffer.
+        written = buffer.write(2, keypoints[2:], valid[2:], np.array([0.0, 100.0, 200.0, 300.0]))
+        overflow = (keypoints[2 + written:], valid[2 + written:], np.array([200.0, 300.0]))
+        stitched = pose_estimation._stitch_chunks(buffer, [(0, 2, None), (2, written, overflow)], fps=10.0)
+
+    assert written == 2
+    np.testing.assert_array_equal(stitched[0], keypoints)
+    np.testing.assert_array_equal(stitched[1], valid)
+    np.testing.assert_allclose(stitched[2], [0.0, 100.0, 200.0, 300.0, 400.0, 500.0])
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import fake_landmarker
+from utils import pose_estimation
+from utils.pose_estimation import ROITracker
+from utils.pose_sequence import NUM_LANDMARKS
+
+WIDTH, HEIGHT = 1280, 720
+
+
+def landmarks_over(x0, y0, x1, y1) -> np.ndarray:
+    """(33, 4) full-frame landmarks spread over a normalized box, all visible."""
+    keypoints = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    keypoints[:, 0] = np.linspace(x0, x1, NUM_LANDMARKS)
+    keypoints[:, 1] = np.linspace(y0, y1, NUM_LANDMARKS)
+    keypoints[:, 3] = 1.0
+    return keypoints
+
+
+def bright_box(image: np.ndarray) -> tuple:
+    """Normalized (x0, y0, x1, y1) bounding box of the white pixels in an image."""
+    ys, xs = np.nonzero(image[..., 0] > 128)
+    height, width = image.shape[:2]
+    return xs.min() / width, ys.min() / height, (xs.max() + 1) / width, (ys.max() + 1) / height
+
+
+def test_to_frame_maps_crop_coordinates_back():
+    keypoints = np.tile(np.array([0.5, 0.25, -0.5, 0.8], dtype=np.float32), (NUM_LANDMARKS, 1))
+
+    ROITracker.to_frame(keypoints, (100, 50, 300, 250), (500, 1000, 3))
+
+    np.testing.assert_allclose(keypoints[0], [0.2, 0.2, -0.1, 0.8], rtol=1e-6)
+
+
+def test_crop_maps_back_to_the_athlete_in_the_frame():
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    frame[100:600, 500:700] = 255
+    roi = ROITracker()
+    roi.update(landmarks_over(*bright_box(frame)), frame.shape)
+
+    image, pixels = roi.crop(frame)
+
+    # A large athlete's crop is still downscaled for inference.
+    assert pixels is not None and max(image.shape[:2]) <= pose_estimation.INFERENCE_MAX_DIMENSION
+    x0, y0, x1, y1 = bright_box(image)
+    corners = landmarks_over(x0, y0, x1, y1)[[0, -1]]
+    ROITracker.to_frame(corners, pixels, frame.shape)
+    np.testing.assert_allclose(corners[:, 0] * WIDTH, [500, 700], atol=2)
+    np.testing.assert_allclose(corners[:, 1] * HEIGHT, [100, 600], atol=2)
+
+
+def test_update_keeps_region_until_the_athlete_nears_its_edge():
+    roi = ROITracker()
+    roi.update(landmarks_over(0.45, 0.4, 0.5, 0.6), (HEIGHT, WIDTH, 3))
+    box = roi.box
+    assert box[0] < 0.45 and box[2] > 0.5 and box[1] < 0.4 and box[3] > 0.6
+
+    roi.update(landmarks_over(0.451, 0.4, 0.501, 0.6), (HEIGHT, WIDTH, 3))
+    assert roi.box == box
+
+    roi.update(landmarks_over(0.52, 0.4, 0.57, 0.6), (HEIGHT, WIDTH, 3))
+    assert roi.box != box and roi.box[2] > 0.57
+
+    roi.update(None, (HEIGHT, WIDTH, 3))
+    assert roi.box is None
+    assert roi.crop(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8))[1] is None
+
+
+@pytest.fixture(scope="module")
+def wide_clip(tmp_path_factory):
+    return fake_landmarker.write_clip(str(tmp_path_factory.mktemp("clips") / "wide.mp4"), WIDTH, HEIGHT, 60,
+                                      box=(40, 120), step=3, start=WIDTH // 2)
+
+
+def test_extraction_with_roi_matches_whole_frame(wide_clip, fake_landmarkers, monkeypatch):
+    monkeypatch.setattr(pose_estimation, "ROI_TRACKING", False)
+    whole = pose_estimation.extract_keypoints_from_video(wide_clip)
+    monkeypatch.setattr(pose_estimation, "ROI_TRACKING", True)
+    fake_landmarkers.input_shapes.clear()
+    cropped = pose_estimation.extract_keypoints_from_video(wide_clip)
+
+    # Everything after the first frame was inferred on a crop smaller than the downscaled whole frame.
+    assert fake_landmarkers.input_shapes[0] == (360, 640)
+    assert all(shape[1] < 640 for shape in fake_landmarkers.input_shapes[1:])
+    np.testing.assert_array_equal(cropped.valid, whole.valid)
+    assert whole.valid.all()
+    # Within the 2 px the whole frame loses to downscaling.
+    np.testing.assert_allclose(cropped.keypoints[:, :, 0] * WIDTH, whole.keypoints[:, :, 0] * WIDTH, atol=2.5)
+    np.testing.assert_allclose(cropped.keypoints[:, :, 1] * HEIGHT, whole.keypoints[:, :, 1] * HEIGHT, atol=2.5)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from analyzers.shuttle_run_analyzer import ShuttleRunAnalyzer
+from analyzers.sprint_analyzer import SPRINT_DISTANCE_METRES, SprintAnalyzer
+from utils.landmarks import PoseLandmark
+from utils.pose_sequence import NUM_LANDMARKS, PoseSequence
+
+
+def distance_from_rest(seconds: np.ndarray, top_speed: float, tau: float) -> np.ndarray:
+    """Metres covered by a runner setting off at t=0 whose speed rises as top_speed * (1 - exp(-t / tau))."""
+    seconds = np.maximum(seconds, 0.0)
+    return top_speed * (seconds - tau * (1.0 - np.exp(-seconds / tau)))
+
+
+def top_speed_for(metres: float, seconds: float, tau: float) -> float:
+    return metres / (seconds - tau * (1.0 - np.exp(-seconds / tau)))
+
+
+def side_on_run(metres: np.ndarray, course_metres: float, fps: float, seed: int = 0) -> PoseSequence:
+    """Hips tracing `metres` along a course filling 80% of the frame width, with some landmark jitter."""
+    hip_x = 0.1 + 0.8 * metres / course_metres
+    keypoints = np.zeros((len(hip_x), NUM_LANDMARKS, 4), dtype=np.float32)
+    keypoints[..., 1] = 0.5
+    keypoints[..., 3] = 1.0
+    rng = np.random.default_rng(seed)
+    for hip in (PoseLandmark.LEFT_HIP.value, PoseLandmark.RIGHT_HIP.value):
+        keypoints[:, hip, 0] = hip_x + rng.normal(0.0, 0.002, len(hip_x))
+    return PoseSequence(keypoints, np.ones(len(hip_x), dtype=bool), np.arange(len(hip_x)) * 1000.0 / fps, fps)
+
+
+@pytest.mark.parametrize("fps", [30.0, 10.0])
+@pytest.mark.parametrize("tau", [0.6, 1.0, 1.4])
+def test_sprint_from_standstill_is_timed_from_setting_off(fps, tau):
+    # One second standing at the line, then 7.0 s to the finish, where the athlete leaves the frame.
+    seconds = np.arange(0.0, 8.0 + 0.5 / fps, 1.0 / fps) - 1.0
+    metres = distance_from_rest(seconds, top_speed_for(SPRINT_DISTANCE_METRES, 7.0, tau), tau)
+    pose = side_on_run(np.minimum(metres, SPRINT_DISTANCE_METRES), SPRINT_DISTANCE_METRES, fps)
+
+    metrics = SprintAnalyzer(pose).analyze()["metrics"]
+
+    assert metrics["time_taken_seconds"] == pytest.approx(7.0, abs=0.1)
+    assert metrics["average_speed_kmh"] == pytest.approx(SPRINT_DISTANCE_METRES / 7.0 * 3.6, abs=0.5)
+
+
+@pytest.mark.parametrize("fps", [30.0, 10.0])
+def test_shuttle_run_from_standstill_is_timed_from_setting_off(fps):
+    step = 1.0 / fps
+    leg_seconds = 2.6
+    # Standing at the start line, then three legs stopping at each line to turn...
+    legs = [np.zeros(int(0.8 * fps))]
+    for leg in range(3):
+        covered = 10.0 * (1.0 - np.cos(np.pi * np.arange(0.0, leg_seconds, step) / leg_seconds)) / 2.0
+        legs.append(covered if leg % 2 == 0 else 10.0 - covered)
+    # ...and a last one run through the start line, reached 2.34 s after the final turn.
+    last_leg = distance_from_rest(np.arange(0.0, 3.0, step), top_speed_for(10.0, 2.34, 0.7), 0.7)
+    legs.append(10.0 - last_leg[last_leg < 10.3])
+    pose = side_on_run(np.concatenate(legs), 10.0, fps)
+
+    metrics = ShuttleRunAnalyzer(pose).analyze()["metrics"]
+
+    assert metrics["turns_detected"] == 3
+    assert metrics["time_taken_seconds"] == pytest.approx(3 * leg_seconds + 2.34, abs=0.1)
@@ -0,0 +1,42 @@
+import struct
+
+import pytest
+
+import fake_landmarker
+from utils.video_processing import mp4_duration_seconds
+
+
+def box(box_type: bytes, body: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(body), box_type) + body
+
+
+def mvhd(timescale: int, duration: int) -> bytes:
+    # Version 0: version/flags, creation and modification times, then timescale and duration.
+    return box(b"mvhd", struct.pack(">IIIII", 0, 0, 0, timescale, duration) + bytes(80))
+
+
+FTYP = box(b"ftyp", b"isom" + bytes(4) + b"isommp41")
+# Compressed media data that happens to contain the bytes "mvhd", followed by what would parse as a huge duration.
+MDAT = box(b"mdat", bytes(1000) + b"mvhd" + bytes(12) + struct.pack(">II", 1, 0xFFFFFF) + bytes(1000))
+MOOV = box(b"moov", mvhd(1000, 12_500) + box(b"trak", bytes(64)))
+
+
+def test_duration_is_read_from_moov_at_the_end():
+    assert mp4_duration_seconds(FTYP + MDAT + MOOV) == pytest.approx(12.5)
+
+
+def test_mvhd_bytes_in_media_data_are_ignored():
+    # Only the start of the file has arrived; the real metadata is still to come.
+    assert mp4_duration_seconds((FTYP + MDAT + MOOV)[:len(FTYP) + len(MDAT) // 2]) is None
+    assert mp4_duration_seconds(FTYP + MDAT) is None
+
+
+def test_duration_is_read_from_moov_before_partial_media_data():
+    data = FTYP + MOOV + MDAT
+    assert mp4_duration_seconds(data[:len(FTYP) + len(MOOV) + 100]) == pytest.approx(12.5)
+
+
+def test_duration_of_a_written_clip(tmp_path):
+    path = fake_landmarker.write_clip(str(tmp_path / "clip.mp4"), 160, 120, 45, fps=15.0)
+    with open(path, "rb") as f:
+        assert mp4_duration_seconds(f.read()) == pytest.approx(3.0, abs=0.1)
@@ -0,0 +1,74 @@
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from utils import webhook_dispatcher
+
+
+@pytest.fixture
+def receiver():
+    """A local webhook endpoint recording the headers of every POST it gets."""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            received.append(dict(self.headers))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/webhook", received
+    server.shutdown()
+
+
+def stored_headers(path) -> list:
+    with sqlite3.connect(path) as connection:
+        return [json.loads(row[0]) for row in connection.execute("SELECT headers FROM outbox")]
+
+
+def deliver(path, received: list, count: int):
+    dispatcher = webhook_dispatcher.WebhookDispatcher(path=str(path), senders=1)
+    dispatcher.start()
+    try:
+        deadline = time.monotonic() + 10
+        while len(received) < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        dispatcher.stop()
+
+
+def test_secret_is_sent_but_not_stored(tmp_path, receiver, monkeypatch):
+    monkeypatch.setattr(webhook_dispatcher, "WEBHOOK_SECRET", "s3cret")
+    url, received = receiver
+    path = tmp_path / "outbox.db"
+
+    webhook_dispatcher.enqueue(url, {"score": 1}, headers={"x-request-id": "abc"}, path=str(path))
+    assert stored_headers(path) == [{"x-request-id": "abc"}]
+
+    deliver(path, received, 1)
+    assert len(received) == 1
+    assert received[0]["x-webhook-secret"] == "s3cret"
+    assert received[0]["x-request-id"] == "abc"
+
+
+def test_secrets_stored_by_older_versions_are_scrubbed(tmp_path, receiver, monkeypatch):
+    monkeypatch.setattr(webhook_dispatcher, "WEBHOOK_SECRET", "s3cret")
+    url, received = receiver
+    path = tmp_path / "outbox.db"
+    webhook_dispatcher.enqueue(url, {"score": 1}, headers={"x-webhook-secret": "old"}, path=str(path))
+    with sqlite3.connect(path) as connection:
+        # A delivery kept for inspection after giving up.
+        connection.execute("UPDATE outbox SET status = 'failed'")
+
+    deliver(path, received, 0)
+
+    assert stored_headers(path) == [{}]
@@ -0,0 +1,213 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from utils import metrics
+
+# --- Job Queue Configuration ---
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "32"))
+JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "1000"))
+RETRY_AFTER_SECONDS = int(os.getenv("QUEUE_RETRY_AFTER_SECONDS", "30"))
+# A worker dying (e.g. OOM-killed) breaks the whole pool and fails every job running in it, without
+# saying which job killed it. Those jobs get this many more tries on a fresh pool before they fail.
+BROKEN_POOL_RETRIES = 1
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+    def __init__(self, retry_after: int = RETRY_AFTER_SECONDS):
+        super().__init__("The analysis queue is full. Please retry later.")
+        self.retry_after = retry_after
+
+
+def _initialize_worker(initializer):
+    """Runs the pool's initializer in a new worker process, reporting why it failed if it does."""
+    try:
+        initializer()
+    except Exception as e:
+        print(f"ERROR: Analysis worker process {os.getpid()} failed to start: {e}", flush=True)
+        raise
+
+
+class JobQueue:
+    """
+    A bounded in-process queue feeding a pool of analysis worker processes.
+
+    One dispatcher thread per worker pulls jobs off the queue and waits for the
+    worker process to finish, so at most `workers` jobs run at once and at most
+    `max_queued` wait behind them. Anything beyond that is rejected up front
+    instead of piling up in memory.
+
+    If a worker process dies, the pool is replaced so later jobs still run;
+    only the job that was running in it fails.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, max_queued: int = MAX_QUEUED_JOBS,
+                 initializer=None, history_limit: int = JOB_HISTORY_LIMIT):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.history_limit = history_limit
+        self._initializer = initializer
+        self._executor = self._create_executor()
+        self._pending = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._running = 0
+        self._shutdown = False
+        self._dispatchers = [
+            threading.Thread(target=self._dispatch_loop, name=f"job-dispatcher-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._dispatchers:
+            thread.start()
+        print(f"Job queue started with {workers} worker(s) and room for {max_queued} queued job(s).")
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # MediaPipe is not fork-safe, so worker processes are always spawned fresh.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=partial(_initialize_worker, self._initializer) if self._initializer else None,
+        )
+
+    def submit(self, fn, *args, on_finished=None) -> str:
+        """
+        Queues `fn(*args)` to run in a worker process and returns its job ID.
+        `fn` must be a picklable module-level function; its return value is
+        kept as the job's result, and the metrics spans it records as the job's spans.
+        `on_finished`, if given, is called in this process with a snapshot of the
+        job once it has completed or failed.
+        """
+        if self._shutdown:
+            raise RuntimeError("Job queue has been shut down.")
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "result": None,
+            # Timed stages reported by the worker, e.g. {"stage": "download", "duration_seconds": ...}.
+            "spans": [],
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            if on_finished is not None:
+                self._callbacks[job_id] = on_finished
+        try:
+            self._pending.put_nowait((job_id, fn, args))
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+                self._callbacks.pop(job_id, None)
+            raise QueueFullError()
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        """Returns a snapshot of the job's status, or None if it is unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self) -> dict:
+        """Current queue depth and number of jobs being processed."""
+        with self._lock:
+            running = self._running
+        return {
+            "queued": self._pending.qsize(),
+            "running": running,
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stops accepting jobs, drains the dispatchers and shuts the worker processes down."""
+        if self._shutdown:
+            return
+        self._shutdown = True
+        for _ in self._dispatchers:
+            self._pending.put((None, None, None))
+        if wait:
+            for thread in self._dispatchers:
+                thread.join()
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        print("Job queue shut down.")
+
+    def _dispatch_loop(self):
+        while True:
+            job_id, fn, args = self._pending.get()
+            if job_id is None:
+                return
+            self._update(job_id, status="running", started_at=time.time())
+            with self._lock:
+                self._running += 1
+            try:
+                result, spans = self._run(fn, args)
+                metrics.replay(spans)
+                metrics.JOBS.labels("completed").inc()
+                job = self._update(job_id, status="completed", finished_at=time.time(), result=result, spans=spans)
+            except Exception as e:
+                print(f"ERROR: Job {job_id} failed in worker: {e}")
+                metrics.JOBS.labels("failed").inc()
+                job = self._update(job_id, status="failed", finished_at=time.time(), error=str(e))
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    on_finished = self._callbacks.pop(job_id, None)
+            if on_finished is not None and job is not None:
+                try:
+                    on_finished(job)
+                except Exception as e:
+                    print(f"ERROR: Completion callback for job {job_id} failed: {e}")
+
+    def _run(self, fn, args) -> tuple:
+        """Runs a job in a worker process, replacing the pool if a worker died and broke it."""
+        for attempt in range(BROKEN_POOL_RETRIES + 1):
+            executor = self._executor
+            try:
+                return executor.submit(metrics.run_collecting_spans, fn, *args).result()
+            except BrokenProcessPool as e:
+                self._replace_executor(executor)
+                if attempt == BROKEN_POOL_RETRIES:
+                    raise RuntimeError(f"The worker process running the job died: {e}") from e
+
+    def _replace_executor(self, broken: ProcessPoolExecutor):
+        """Swaps a broken pool for a fresh one, unless another dispatcher already has."""
+        with self._lock:
+            if self._executor is not broken or self._shutdown:
+                return
+            print("Warning: An analysis worker process died; starting a new worker pool.")
+            self._executor = self._create_executor()
+        broken.shutdown(wait=False)
+
+    def _update(self, job_id: str, **fields) -> dict | None:
+        """Updates a job and returns a snapshot of it, taken before old jobs are evicted."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            snapshot = dict(job)
+            if fields.get("finished_at"):
+                self._evict_finished()
+            return snapshot
+
+    def _evict_finished(self):
+        # Keep the history bounded by dropping the oldest finished jobs first.
+        excess = len(self._jobs) - self.history_limit
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, job in self._jobs.items() if job["finished_at"]][:excess]:
+            del self._jobs[job_id]
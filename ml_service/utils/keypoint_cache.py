@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+import uuid
+
+import numpy as np
+
+from utils import metrics
+from utils.pose_sequence import PoseSequence
+
+# --- Keypoint Cache Configuration ---
+KEYPOINT_CACHE_DIR = os.getenv("KEYPOINT_CACHE_DIR", "keypoint_cache")
+# Total size the cache may grow to on disk, e.g. 2147483648 for 2 GiB. 0 (the default) disables caching.
+# Entries are keyed by the video's content hash, so with the cache enabled every video is downloaded
+# and hashed in full before extraction instead of being streamed from its URL (see STREAM_FROM_URL):
+# repeated videos skip inference, but no video overlaps its download with inference any more.
+KEYPOINT_CACHE_MAX_BYTES = int(os.getenv("KEYPOINT_CACHE_MAX_BYTES", "0"))
+
+
+class KeypointCache:
+    """
+    An on-disk cache of extracted pose sequences, keyed by the video's content
+    hash plus every setting that changes the extraction result.
+
+    Entries are compressed .npz files. Reads refresh an entry's mtime and, when
+    the cache outgrows `max_bytes`, the least recently used entries are evicted.
+    The directory can be shared by several worker processes.
+    """
+
+    def __init__(self, directory: str = KEYPOINT_CACHE_DIR, max_bytes: int = KEYPOINT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash: str, *settings) -> str:
+        """Combines a video's content hash with the extraction settings into a cache key."""
+        material = ":".join([content_hash, *map(str, settings)])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key: str) -> PoseSequence | None:
+        """Returns the cached pose sequence for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                fps = float(data["fps"])
+                pose_sequence = PoseSequence(data["keypoints"], data["valid"], data["timestamps_ms"], fps or None)
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            # Missing, evicted mid-read by another worker, or corrupt: treat all as a miss.
+            metrics.record_event("keypoint_cache", result="miss")
+            return None
+        metrics.record_event("keypoint_cache", result="hit")
+        print(f"Keypoint cache hit for {key[:12]}.")
+        return pose_sequence
+
+    def put(self, key: str, pose_sequence: PoseSequence):
+        """Stores a pose sequence and evicts old entries if the cache is over its size limit."""
+        temp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.npz")
+        try:
+            np.savez_compressed(
+                temp_path,
+                keypoints=pose_sequence.keypoints,
+                valid=pose_sequence.valid,
+                timestamps_ms=pose_sequence.timestamps_ms,
+                fps=np.float64(pose_sequence.fps or 0.0),
+            )
+            # Atomic so concurrent readers never see a half-written entry.
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            print(f"Warning: Could not write keypoint cache entry: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        total_bytes = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".npz") or entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+        if total_bytes <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
+
+
+_cache: KeypointCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_keypoint_cache() -> KeypointCache | None:
+    """Returns the process-wide keypoint cache, or None if caching is disabled."""
+    global _cache
+    if KEYPOINT_CACHE_MAX_BYTES <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = KeypointCache()
+        return _cache
@@ -16,4 +16,160 @@ def calculate_angle(a, b, c) -> float:
     cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
     angle = np.arccos(cosine_angle)
 
-    return np.degrees(angle)
\ No newline at end of file
+    return np.degrees(angle)
+
+# --- Batched Kernels ---
+# These operate on whole tracks of points at once, e.g. `pose.landmark(i)[:, :2]`.
+
+def calculate_angles(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `calculate_angle` over N frames.
+    a, b and c are (N, 2) or (N, 3) arrays, 'b' being the vertex.
+    Returns an (N,) array of angles in degrees, NaN where a segment has zero length.
+    """
+    ba = np.asarray(a, dtype=np.float64) - b
+    bc = np.asarray(c, dtype=np.float64) - b
+    norms = np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosine_angles = np.einsum("ij,ij->i", ba, bc) / norms
+    return np.degrees(np.arccos(np.clip(cosine_angles, -1.0, 1.0)))
+
+def midpoints(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Element-wise midpoint of two equally shaped point arrays."""
+    return (np.asarray(a) + np.asarray(b)) / 2
+
+def displacements(points: np.ndarray) -> np.ndarray:
+    """Frame-to-frame displacement of a track: (N, ...) -> (N - 1, ...)."""
+    return np.diff(points, axis=0)
+
+def velocities(points: np.ndarray, timestamps_ms: np.ndarray) -> np.ndarray:
+    """
+    Frame-to-frame velocity of a track in units per second.
+    points is (N,) or (N, D) and timestamps_ms is (N,); returns N - 1 rows.
+    """
+    dt = np.diff(np.asarray(timestamps_ms, dtype=np.float64)) / 1000.0
+    dt[dt <= 0] = np.nan
+    steps = displacements(np.asarray(points, dtype=np.float64))
+    return steps / dt.reshape((-1,) + (1,) * (steps.ndim - 1))
+
+def hysteresis_crossings(values: np.ndarray, enter_threshold: float, exit_threshold: float,
+                         entered: bool = False) -> tuple[np.ndarray, bool]:
+    """
+    Finds completed enter/exit cycles in a 1D signal without a Python loop.
+
+    A cycle starts when a value rises above `enter_threshold` and completes
+    when a later value falls below `exit_threshold`; values in between never
+    change state. This is the state machine behind repetition and jump counting.
+
+    Args:
+        values (np.ndarray): The signal, e.g. a landmark's y-coordinate per frame.
+        enter_threshold (float): Level above which the signal enters a cycle.
+        exit_threshold (float): Level below which the signal completes a cycle.
+        entered (bool): Whether a cycle was already in progress before `values[0]`.
+
+    Returns:
+        tuple: (indices into `values` where each cycle completed, whether a
+        cycle is still in progress after the last value).
+    """
+    values = np.asarray(values)
+    # Every value beyond a threshold forces the state; values in between carry the previous state.
+    marks = np.where(values > enter_threshold, 1, np.where(values < exit_threshold, -1, 0))
+    changed = np.flatnonzero(marks)
+    states = np.concatenate(([1 if entered else -1], marks[changed]))
+    completed = changed[(states[1:] == -1) & (states[:-1] == 1)]
+    return completed, bool(states[-1] == 1)
+
+def first_crossing_ms(values: np.ndarray, timestamps_ms: np.ndarray, level: float, start: int = 0) -> float | None:
+    """
+    The time at which a signal first rises to `level` at or after index `start`,
+    interpolated linearly between the two frames either side of the crossing,
+    so the result doesn't depend on which frames were sampled. For a falling
+    crossing, pass the negated signal and level.
+
+    Returns:
+        float | None: The crossing time in ms, or None if the signal never reaches `level`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    hits = np.flatnonzero(values[start:] >= level)
+    if not hits.size:
+        return None
+    i = start + hits[0]
+    if i == 0 or values[i - 1] >= level:
+        return float(timestamps_ms[i])
+    fraction = (level - values[i - 1]) / (values[i] - values[i - 1])
+    return float(timestamps_ms[i - 1] + fraction * (timestamps_ms[i] - timestamps_ms[i - 1]))
+
+
+# Motion onset search: acceleration time constants to try, and how long before the threshold
+# crossing (in ms, searched in steps of _ONSET_STEP_MS) the athlete can have set off.
+_ONSET_TAUS_S = np.geomspace(0.2, 3.0, 40)
+_ONSET_SEARCH_MS = 1500.0
+_ONSET_STEP_MS = 5.0
+
+
+def motion_onset_ms(values: np.ndarray, timestamps_ms: np.ndarray, level: float, fit_until: float) -> float | None:
+    """
+    When a signal that starts at rest set off, e.g. progress along a run from a
+    standing start. Crossing a small `level` above rest is late by however long
+    the acceleration took to get there, easily most of a second. Instead the
+    signal up to `fit_until` is fitted with the standard sprint model, speed
+    rising as vmax * (1 - exp(-t / tau)) from the onset, and the best fit's onset
+    is returned. Never later than the `level` crossing.
+
+    Returns:
+        float | None: The onset time in ms, or None if the signal never reaches `level`.
+    """
+    crossing_ms = first_crossing_ms(values, timestamps_ms, level)
+    if crossing_ms is None:
+        return None
+    values = np.asarray(values, dtype=np.float64)
+    timestamps_ms = np.asarray(timestamps_ms, dtype=np.float64)
+    reached = np.flatnonzero(values >= fit_until)
+    stop = int(reached[0]) + 1 if reached.size else len(values)
+    # Reaches back past the earliest candidate onset, so some rest anchors the resting level.
+    window = (timestamps_ms >= crossing_ms - 2 * _ONSET_SEARCH_MS) & (np.arange(len(values)) < stop)
+    if window.sum() < 4:
+        return crossing_ms
+    seconds = timestamps_ms[window] / 1000.0
+    fitted = values[window]
+    onsets = np.arange(crossing_ms - _ONSET_SEARCH_MS, crossing_ms, _ONSET_STEP_MS) / 1000.0
+
+    best_error, best_onset = np.inf, crossing_ms
+    for tau in _ONSET_TAUS_S:
+        # Distance covered since each candidate onset, per unit of top speed: shape (onsets, frames).
+        elapsed = np.maximum(seconds[None, :] - onsets[:, None], 0.0)
+        shape = elapsed - tau * (1.0 - np.exp(-elapsed / tau))
+        # Least-squares resting level and top speed for every onset at once.
+        n = len(seconds)
+        sum_shape, sum_shape2 = shape.sum(axis=1), (shape ** 2).sum(axis=1)
+        sum_values, sum_products = fitted.sum(), shape @ fitted
+        denominator = n * sum_shape2 - sum_shape ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed = (n * sum_products - sum_shape * sum_values) / denominator
+        rest = (sum_values - speed * sum_shape) / n
+        errors = ((rest[:, None] + speed[:, None] * shape - fitted[None, :]) ** 2).sum(axis=1)
+        errors[~(speed > 0)] = np.inf
+        i = int(np.argmin(errors))
+        if errors[i] < best_error:
+            best_error, best_onset = errors[i], onsets[i] * 1000.0
+    return float(best_onset)
+
+
+def projected_crossing_ms(values: np.ndarray, timestamps_ms: np.ndarray, level: float, near: float, far: float,
+                          start: int = 0) -> float | None:
+    """
+    The time a rising signal reaches `level`, projected from when it crossed
+    `near` at the average rate it rose from `far` to `near` (far < near < level).
+    For a finish line the signal runs through but whose exact value isn't
+    reliably reached, e.g. the end of the visible course.
+
+    Returns:
+        float | None: The projected time in ms, or None if the signal never reaches `near` after `start`.
+    """
+    near_ms = first_crossing_ms(values, timestamps_ms, near, start=start)
+    far_ms = first_crossing_ms(values, timestamps_ms, far, start=start)
+    if near_ms is None:
+        return None
+    if far_ms is None or near_ms <= far_ms:
+        return near_ms
+    return near_ms + (level - near) * (near_ms - far_ms) / (near - far)
@@ -0,0 +1,121 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# --- Prometheus Metrics ---
+# Everything is exported from the API process. Work done in the analysis worker
+# processes is recorded as spans, shipped back with each job's result and
+# observed here (see `run_collecting_spans`), so no multiprocess setup is needed.
+STAGE_DURATION = Histogram(
+    "analysis_stage_duration_seconds", "Time spent in each stage of the analysis pipeline.", ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+FRAMES = Counter("analysis_frames_total", "Video frames processed, by stage.", ["stage"])
+JOBS = Counter("analysis_jobs_total", "Finished analysis jobs, by status.", ["status"])
+TESTS = Counter("analysis_tests_total", "Analyzed tests, by test type and outcome.", ["test_type", "outcome"])
+CACHE_REQUESTS = Counter("keypoint_cache_requests_total", "Keypoint cache lookups, by result.", ["result"])
+WEBHOOK_DELIVERIES = Counter("webhook_deliveries_total", "Webhook delivery attempts, by outcome.", ["outcome"])
+ANALYZE_REQUESTS = Counter("analyze_requests_total",
+                           "Analyze requests, by whether they started a job or joined an identical one in flight.",
+                           ["outcome"])
+QUEUE_DEPTH = Gauge("analysis_queue_depth", "Jobs waiting for a worker.")
+JOBS_IN_FLIGHT = Gauge("analysis_jobs_in_flight", "Jobs being processed by a worker.")
+WEBHOOK_PENDING = Gauge("webhook_outbox_pending", "Webhook deliveries waiting in the outbox.")
+MODEL_LOAD_SECONDS = Gauge("model_load_seconds", "Time the last load of each model took in a worker.", ["model"])
+MODEL_MEMORY = Gauge("model_resident_bytes", "Resident memory added by loading each model in a worker.", ["model"])
+
+# Counters fed by `record_event`, by event name.
+_EVENT_COUNTERS = {
+    "test": TESTS,
+    "keypoint_cache": CACHE_REQUESTS,
+    "webhook": WEBHOOK_DELIVERIES,
+    "analyze_request": ANALYZE_REQUESTS,
+}
+
+# Spans recorded by the job currently running in this process, or None when
+# running in the API process, where they are observed straight away.
+_job_spans: list | None = None
+
+
+# --- Recording ---
+def _finish(record: dict):
+    if _job_spans is not None:
+        _job_spans.append(record)
+    else:
+        observe(record)
+
+
+def record_span(stage: str, duration_seconds: float, **attributes):
+    """Records a stage that was already timed, e.g. busy time accumulated across a loop."""
+    _finish({"stage": stage, "duration_seconds": duration_seconds, **attributes})
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Times the enclosed block as one pipeline stage. The yielded dict can be
+    given more attributes inside the block; a "frames" attribute also counts
+    towards the stage's frame throughput.
+    """
+    record = {"stage": stage, "started_at": time.time(), **attributes}
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["duration_seconds"] = time.perf_counter() - start
+        _finish(record)
+
+
+def record_event(name: str, **labels):
+    """Counts an occurrence, e.g. record_event("keypoint_cache", result="hit")."""
+    _finish({"event": name, **labels})
+
+
+def observe(record: dict):
+    """Applies a span or event record to the Prometheus metrics of this process."""
+    if "event" in record:
+        labels = {key: value for key, value in record.items() if key != "event"}
+        _EVENT_COUNTERS[record["event"]].labels(**labels).inc()
+        return
+    STAGE_DURATION.labels(record["stage"]).observe(record["duration_seconds"])
+    if record.get("frames"):
+        FRAMES.labels(record["stage"]).inc(record["frames"])
+    if "memory_bytes" in record:
+        MODEL_LOAD_SECONDS.labels(record["model"]).set(record["duration_seconds"])
+        MODEL_MEMORY.labels(record["model"]).set(record["memory_bytes"])
+
+
+def replay(records: list):
+    """Records spans and events collected in another process as if they had happened here."""
+    for record in records:
+        _finish(record)
+
+
+def run_collecting_spans(fn, *args):
+    """
+    Runs `fn(*args)` in a worker process and returns (result, spans), where
+    spans are the records made while it ran. Module-level so it can be pickled.
+    """
+    global _job_spans
+    _job_spans = []
+    try:
+        result = fn(*args)
+        return result, _job_spans
+    finally:
+        _job_spans = None
+
+
+# --- Export ---
+def track_gauges(job_queue=None, dispatcher=None):
+    """Reads the queue and outbox gauges from their owners on every scrape."""
+    if job_queue is not None:
+        QUEUE_DEPTH.set_function(lambda: job_queue.stats()["queued"])
+        JOBS_IN_FLIGHT.set_function(lambda: job_queue.stats()["running"])
+    if dispatcher is not None:
+        WEBHOOK_PENDING.set_function(dispatcher.pending_count)
+
+
+def export() -> tuple:
+    """Returns the current metrics in the Prometheus text format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,174 @@
+import os
+import threading
+
+import numpy as np
+
+from utils import metrics
+
+# --- Model Registry Configuration ---
+ML_MODELS_DIR = os.getenv("ML_MODELS_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "ml_models"))
+# Model name -> artifact file in ML_MODELS_DIR. The file extension picks the framework.
+MODEL_FILES = {
+    "jump_height": "jump_height_predictor.pkl",
+    "sport_classification": "sport_classification.h5",
+    "squat_form": "squat_form_corrector.pt",
+}
+
+
+# --- Framework Backends ---
+# Each backend is only imported when a model that needs it is first loaded, so
+# torch and TensorFlow stay optional: without them those models just report
+# themselves unavailable.
+def _load_joblib(path: str):
+    import joblib
+    # Memory-maps the arrays in the pickle instead of reading them into this process,
+    # so every worker process shares the same read-only pages of the file.
+    return joblib.load(path, mmap_mode="r")
+
+
+def _predict_sklearn(model, features: np.ndarray) -> np.ndarray:
+    return np.asarray(model.predict(features))
+
+
+def _load_torch(path: str):
+    import torch
+    # mmap=True leaves the tensors backed by the file, shared across worker processes.
+    model = torch.load(path, map_location="cpu", mmap=True, weights_only=False)
+    model.eval()
+    return model
+
+
+def _predict_torch(model, features: np.ndarray) -> np.ndarray:
+    import torch
+    with torch.inference_mode():
+        return model(torch.from_numpy(np.ascontiguousarray(features, dtype=np.float32))).numpy()
+
+
+def _load_keras(path: str):
+    from tensorflow import keras
+    # HDF5 weights can't be memory-mapped, so each worker process holds its own copy.
+    return keras.models.load_model(path, compile=False)
+
+
+def _predict_keras(model, features: np.ndarray) -> np.ndarray:
+    return np.asarray(model.predict(features, verbose=0))
+
+
+_BACKENDS = {
+    ".pkl": (_load_joblib, _predict_sklearn),
+    ".joblib": (_load_joblib, _predict_sklearn),
+    ".pt": (_load_torch, _predict_torch),
+    ".h5": (_load_keras, _predict_keras),
+}
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process, or 0 where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ModelRegistry:
+    """
+    The trained models in ML_MODELS_DIR, each loaded the first time it is
+    used. A model whose artifact is missing, empty, fails to load or fails
+    to predict (e.g. it expects different features) is reported once and
+    then treated as unavailable, so analyzers can fall back to their heuristics.
+    """
+
+    def __init__(self, model_files: dict[str, str] = MODEL_FILES, directory: str = ML_MODELS_DIR):
+        self.directory = directory
+        self._files = dict(model_files)
+        self._models = {}
+        self._stats = {}
+        self._locks = {name: threading.Lock() for name in self._files}
+
+    def get(self, name: str):
+        """
+        Returns the loaded model called `name`, loading it on first use.
+
+        Returns:
+            The model object, or None if it isn't available.
+        """
+        if name in self._models:
+            return self._models[name]
+        with self._locks[name]:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+        return self._models[name]
+
+    def _load(self, name: str):
+        path = os.path.join(self.directory, self._files[name])
+        load, _ = _BACKENDS[os.path.splitext(path)[1]]
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            print(f"Warning: Model '{name}' is unavailable: {path} is missing or empty.")
+            self._stats[name] = {"loaded": False, "error": "missing or empty artifact"}
+            return None
+
+        rss_before = _rss_bytes()
+        try:
+            with metrics.span("model_load", model=name) as record:
+                model = load(path)
+                record["memory_bytes"] = max(0, _rss_bytes() - rss_before)
+        except Exception as e:
+            print(f"Warning: Model '{name}' could not be loaded from {path}: {e}")
+            self._stats[name] = {"loaded": False, "error": str(e)}
+            return None
+
+        self._stats[name] = {
+            "loaded": True,
+            "load_seconds": round(record["duration_seconds"], 3),
+            "memory_bytes": record["memory_bytes"],
+            "file_bytes": os.path.getsize(path),
+        }
+        print(f"Loaded model '{name}' in {record['duration_seconds']:.2f}s "
+              f"(+{record['memory_bytes'] / 1024**2:.1f} MiB resident).")
+        return model
+
+    def predict(self, name: str, features) -> np.ndarray | None:
+        """
+        Runs a batch through a model in one call.
+
+        Args:
+            name (str): The model's name in MODEL_FILES.
+            features: One row of features per sample, shape (samples, features).
+
+        Returns:
+            np.ndarray | None: One prediction per row, or None if the model isn't available.
+        """
+        model = self.get(name)
+        if model is None:
+            return None
+        features = np.atleast_2d(np.asarray(features, dtype=np.float32))
+        if not len(features):
+            return np.zeros(0, dtype=np.float32)
+        _, predict = _BACKENDS[os.path.splitext(self._files[name])[1]]
+        try:
+            return predict(model, features)
+        except Exception as e:
+            with self._locks[name]:
+                if self._models.get(name) is not None:
+                    print(f"Warning: Model '{name}' failed to predict and won't be used again: {e}")
+                    self._models[name] = None
+                    self._stats[name] = {**self._stats.get(name, {}), "loaded": False, "error": str(e)}
+            return None
+
+    def stats(self) -> dict:
+        """Load time and resident memory of each model loaded (or tried) so far in this process."""
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+_registry: ModelRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Returns this process's model registry, creating it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
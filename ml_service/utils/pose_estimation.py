@@ -1,59 +1,800 @@
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
 import cv2
-import mediapipe as mp
 import numpy as np
 
-# Import the new Task components
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
+from utils import metrics
+from utils.pose_sequence import PoseSequence, PoseSequenceBuilder
+from utils.shared_pose import SharedPoseBuffer
+from utils.video_processing import check_capture_duration
+
+# --- Landmarker Pool Configuration ---
+# Model complexity trades accuracy for throughput; each variant is its own .task bundle.
+# Only the POSE_MODEL_VARIANT bundle has to be deployed: a job asking for a variant whose
+# bundle isn't on disk runs on POSE_MODEL_VARIANT instead.
+MODEL_ASSET_PATHS = {
+    "lite": os.getenv("POSE_MODEL_LITE_PATH", "pose_landmarker_lite.task"),
+    "full": os.getenv("POSE_MODEL_FULL_PATH", "pose_landmarker_full.task"),
+    "heavy": os.getenv("POSE_MODEL_PATH", "pose_landmarker_heavy.task"),
+}
+DEFAULT_MODEL_VARIANT = os.getenv("POSE_MODEL_VARIANT", "heavy")
+LANDMARKER_POOL_SIZE = int(os.getenv("LANDMARKER_POOL_SIZE", "1"))
+LANDMARKER_CHECKOUT_TIMEOUT = float(os.getenv("LANDMARKER_CHECKOUT_TIMEOUT", "300"))
+# Timestamp gap inserted between videos processed by the same VIDEO-mode landmarker.
+_STREAM_GAP_MS = 10_000
+
+# --- Decode Pipeline Configuration ---
+# Frames decoded ahead of inference. Bounds memory while letting decode and inference overlap.
+DECODE_QUEUE_SIZE = int(os.getenv("DECODE_QUEUE_SIZE", "32"))
+
+# --- Inference Preprocessing Configuration ---
+# Frames are downscaled so their longer side is at most this many pixels before inference.
+# The landmarker's own inputs are 224-256px, but it crops the athlete out of the frame first,
+# so some headroom above that keeps small, distant subjects accurate.
+INFERENCE_MAX_DIMENSION = int(os.getenv("INFERENCE_MAX_DIMENSION", "640"))
+
+# --- ROI Tracking Configuration ---
+# Infer on a crop around the athlete, placed from the previous frame's landmarks, instead of the whole frame.
+# The crop is cut from the full-resolution frame, so small, distant subjects keep more detail.
+ROI_TRACKING = os.getenv("ROI_TRACKING", "1") == "1"
+# Margin added around the landmarks on each side, as a fraction of the pose's larger dimension.
+ROI_PADDING = float(os.getenv("ROI_PADDING", "0.3"))
+# Landmarks below this visibility don't count towards the athlete's extent.
+ROI_MIN_VISIBILITY = 0.5
+# Smallest crop, as a fraction of the frame's longer side.
+_ROI_MIN_SIZE = 0.2
+# Crops covering more of the frame than this aren't worth it; the whole frame is used instead.
+_ROI_MAX_AREA = 0.6
+# Full-resolution frames are large, so fewer are decoded ahead when tracking is on.
+_FULL_RESOLUTION_QUEUE_SIZE = 4
+
+# --- URL Streaming Configuration ---
+# A stream that decodes fewer than this share of the container's advertised frames was cut off.
+_STREAM_MIN_FRAME_FRACTION = 0.98
 
-def extract_keypoints_from_video(video_path: str) -> list:
+# --- Frame Sampling Configuration ---
+# Overrides the per-test sampling policy for every job when set, e.g. "all", "fixed:15", "adaptive:4" or "adaptive:4:8".
+POSE_SAMPLING_OVERRIDE = os.getenv("POSE_SAMPLING_OVERRIDE")
+# Mean absolute grey-level difference (0-255) between thumbnails that counts as fast motion.
+MOTION_THRESHOLD = float(os.getenv("SAMPLING_MOTION_THRESHOLD", "6.0"))
+_MOTION_THUMBNAIL_SIZE = (64, 64)
+
+# --- Parallel Extraction Configuration ---
+# Processes that long local videos are split across, each with its own landmarker.
+# Every analysis worker gets its own set, so keep ANALYSIS_WORKERS x this within the core count. 0 disables.
+PARALLEL_EXTRACTION_WORKERS = int(os.getenv("PARALLEL_EXTRACTION_WORKERS", "0"))
+# Videos shorter than this are extracted in one pass; splitting them costs more in startup than it saves.
+PARALLEL_EXTRACTION_MIN_SECONDS = float(os.getenv("PARALLEL_EXTRACTION_MIN_SECONDS", "60"))
+# Extra frames decoded on each side of a chunk so pose tracking has settled and skipped
+# frames at the edges can be interpolated. They are dropped when the chunks are stitched.
+CHUNK_OVERLAP_FRAMES = int(os.getenv("CHUNK_OVERLAP_FRAMES", "15"))
+
+
+def _create_landmarker(model_asset_path: str, segmentation_masks: bool = False):
+    """Builds a VIDEO-mode PoseLandmarker and runs one dummy frame through it so the first real job doesn't pay for graph init."""
+    # MediaPipe takes most of a second to import, so it is only loaded by processes that run inference.
+    import mediapipe as mp
+    from mediapipe.tasks import python
+    from mediapipe.tasks.python import vision
+
+    base_options = python.BaseOptions(model_asset_path=model_asset_path)
+    options = vision.PoseLandmarkerOptions(
+        base_options=base_options,
+        running_mode=vision.RunningMode.VIDEO,
+        output_segmentation_masks=segmentation_masks)
+    landmarker = vision.PoseLandmarker.create_from_options(options)
+
+    warmup_frame = np.zeros((256, 256, 3), dtype=np.uint8)
+    landmarker.detect_for_video(mp.Image(image_format=mp.ImageFormat.SRGB, data=warmup_frame), 0)
+    return landmarker
+
+
+class VideoLandmarker:
     """
-    Extracts pose keypoints from a video file using the new MediaPipe Tasks API.
+    A pooled VIDEO-mode landmarker. MediaPipe tracks the pose from frame to
+    frame and only re-runs the full detector when tracking is lost, but it
+    requires timestamps to increase monotonically for the landmarker's whole
+    lifetime. Each video therefore gets its own timestamp range, offset past
+    everything the landmarker has already seen.
+    """
+
+    def __init__(self, model_asset_path: str, segmentation_masks: bool = False):
+        self._landmarker = _create_landmarker(model_asset_path, segmentation_masks)
+        self._last_timestamp_ms = 0
+        self._offset_ms = 0
+
+    def begin_video(self):
+        """Starts a new timestamp range for the next video."""
+        self._offset_ms = self._last_timestamp_ms + _STREAM_GAP_MS
+
+    def detect(self, mp_image, timestamp_ms: float):
+        """Runs pose detection/tracking on a frame at the given presentation time within the current video."""
+        timestamp = self._offset_ms + int(timestamp_ms)
+        timestamp = max(timestamp, self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp
+        return self._landmarker.detect_for_video(mp_image, timestamp)
+
+    def close(self):
+        self._landmarker.close()
+
+
+class LandmarkerPool:
+    """
+    A fixed-size pool of pre-warmed landmarkers for one model variant, with
+    or without segmentation mask output.
+
+    Landmarkers are not thread-safe, so each job checks one out for the
+    duration of its extraction and returns it afterwards.
+    """
+
+    def __init__(self, size: int = LANDMARKER_POOL_SIZE, model_asset_path: str = MODEL_ASSET_PATHS[DEFAULT_MODEL_VARIANT],
+                 segmentation_masks: bool = False):
+        if size < 1:
+            raise ValueError("Landmarker pool size must be at least 1.")
+        self.size = size
+        self.model_asset_path = model_asset_path
+        self.segmentation_masks = segmentation_masks
+        self._landmarkers = [VideoLandmarker(model_asset_path, segmentation_masks) for _ in range(size)]
+        self._idle = queue.Queue(maxsize=size)
+        for landmarker in self._landmarkers:
+            self._idle.put(landmarker)
+        self._closed = False
+        print(f"Landmarker pool ready with {size} instance(s) of '{model_asset_path}'.")
+
+    @contextmanager
+    def checkout(self, timeout: float | None = LANDMARKER_CHECKOUT_TIMEOUT):
+        """Borrows an idle landmarker, blocking up to `timeout` seconds if all are busy."""
+        if self._closed:
+            raise RuntimeError("Landmarker pool has been closed.")
+        try:
+            landmarker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for an idle pose landmarker.")
+        landmarker.begin_video()
+        try:
+            yield landmarker
+        finally:
+            self._idle.put(landmarker)
+
+    def close(self):
+        """Releases the native resources held by every landmarker in the pool."""
+        if self._closed:
+            return
+        self._closed = True
+        for landmarker in self._landmarkers:
+            landmarker.close()
+        self._landmarkers = []
+        print("Landmarker pool closed.")
+
+
+_pools: dict[tuple[str, bool], LandmarkerPool] = {}
+_pool_lock = threading.Lock()
+_missing_variants = set()
+
+
+def resolve_model_variant(model_variant: str | None) -> str:
+    """
+    Returns the variant that will actually be used, validating it. Falls back to
+    POSE_MODEL_VARIANT when the variant's bundle isn't on disk.
+    """
+    model_variant = model_variant or DEFAULT_MODEL_VARIANT
+    if model_variant not in MODEL_ASSET_PATHS:
+        raise ValueError(f"Unknown pose model variant '{model_variant}'.")
+    if model_variant != DEFAULT_MODEL_VARIANT and not os.path.isfile(MODEL_ASSET_PATHS[model_variant]):
+        if model_variant not in _missing_variants:
+            _missing_variants.add(model_variant)
+            print(f"Warning: Pose model '{model_variant}' is unavailable ({MODEL_ASSET_PATHS[model_variant]} not found); "
+                  f"using '{DEFAULT_MODEL_VARIANT}' instead.")
+        return DEFAULT_MODEL_VARIANT
+    return model_variant
+
+
+def init_landmarker_pool(model_variant: str | None = None, segmentation_masks: bool = False,
+                         size: int = LANDMARKER_POOL_SIZE) -> LandmarkerPool:
+    """Creates the process-wide landmarker pool for a model variant. Safe to call more than once."""
+    key = (resolve_model_variant(model_variant), segmentation_masks)
+    with _pool_lock:
+        if key not in _pools:
+            _pools[key] = LandmarkerPool(size, MODEL_ASSET_PATHS[key[0]], segmentation_masks)
+        return _pools[key]
+
+
+def get_landmarker_pool(model_variant: str | None = None, segmentation_masks: bool = False) -> LandmarkerPool:
+    """Returns the process-wide pool for a model variant, creating it on first use."""
+    pool = _pools.get((resolve_model_variant(model_variant), segmentation_masks))
+    return pool if pool is not None else init_landmarker_pool(model_variant, segmentation_masks)
+
+
+def close_landmarker_pool():
+    """Closes every process-wide landmarker pool that was created, and the chunk workers if any were started."""
+    global _chunk_executor
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        if _chunk_executor is not None:
+            _chunk_executor.shutdown()
+            _chunk_executor = None
+
+
+# --- Frame Sampling ---
+class SamplingPolicy:
+    """
+    Decides which decoded frames go through the landmarker. Skipped frames get
+    landmarks interpolated from their inferred neighbours.
+
+    Modes:
+        "all": every frame is inferred.
+        "fixed": frames are inferred at roughly `target_fps`.
+        "adaptive": at least every `max_stride`-th frame is inferred, plus every
+            frame that differs noticeably from the last inferred one, so sampling
+            densifies around fast motion.
+    """
+
+    MODES = ("all", "fixed", "adaptive")
+
+    def __init__(self, mode: str = "all", target_fps: float | None = None, max_stride: int = 1,
+                 motion_threshold: float = MOTION_THRESHOLD):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown sampling mode '{mode}'.")
+        if mode == "fixed" and not target_fps:
+            raise ValueError("Fixed sampling needs a target FPS.")
+        self.mode = mode
+        self.target_fps = target_fps
+        self.max_stride = max(1, int(max_stride))
+        self.motion_threshold = motion_threshold
+
+    @classmethod
+    def all_frames(cls) -> "SamplingPolicy":
+        return cls("all")
+
+    @classmethod
+    def fixed(cls, target_fps: float) -> "SamplingPolicy":
+        return cls("fixed", target_fps=target_fps)
+
+    @classmethod
+    def adaptive(cls, max_stride: int, motion_threshold: float = MOTION_THRESHOLD) -> "SamplingPolicy":
+        return cls("adaptive", max_stride=max_stride, motion_threshold=motion_threshold)
+
+    @classmethod
+    def parse(cls, spec: str) -> "SamplingPolicy":
+        """Parses "all", "fixed:<fps>" or "adaptive:<max_stride>[:<motion_threshold>]"."""
+        mode, _, value = spec.strip().lower().partition(":")
+        if mode == "fixed":
+            return cls.fixed(float(value))
+        if mode == "adaptive":
+            max_stride, _, threshold = value.partition(":")
+            return cls.adaptive(int(max_stride or 4), float(threshold) if threshold else MOTION_THRESHOLD)
+        return cls(mode)
+
+    def __repr__(self):
+        # Also the policy's part of the keypoint cache key, so it names every setting that changes the output.
+        if self.mode == "fixed":
+            return f"fixed:{self.target_fps:g}"
+        if self.mode == "adaptive":
+            return f"adaptive:{self.max_stride}:{self.motion_threshold:g}"
+        return self.mode
+
+
+class FrameSampler:
+    """Per-video state for applying a SamplingPolicy in decode order."""
+
+    def __init__(self, policy: SamplingPolicy, fps: float | None):
+        self.policy = policy
+        self.stride = 1
+        if policy.mode == "fixed" and fps and fps > policy.target_fps:
+            self.stride = max(1, round(fps / policy.target_fps))
+        self._last_thumbnail = None
+        self._since_inferred = 0
+
+    def needs_pixels(self, index: int) -> bool:
+        """Whether frame `index` has to be decoded at all. Fixed sampling can skip decoding unselected frames."""
+        return self.policy.mode != "fixed" or index % self.stride == 0
+
+    def select(self, index: int, frame) -> bool:
+        """Whether frame `index` should be sent for inference."""
+        if self.policy.mode == "all":
+            return True
+        if self.policy.mode == "fixed":
+            return index % self.stride == 0
+
+        # Cheap motion estimate: compare small greyscale thumbnails against the last inferred frame.
+        thumbnail = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), _MOTION_THUMBNAIL_SIZE,
+                               interpolation=cv2.INTER_AREA)
+        self._since_inferred += 1
+        if (self._last_thumbnail is None
+                or self._since_inferred >= self.policy.max_stride
+                or cv2.absdiff(thumbnail, self._last_thumbnail).mean() > self.policy.motion_threshold):
+            self._last_thumbnail = thumbnail
+            self._since_inferred = 0
+            return True
+        return False
+
+
+def resolve_sampling_policy(default: SamplingPolicy | None) -> SamplingPolicy:
+    """Applies the POSE_SAMPLING_OVERRIDE setting on top of a test's default policy."""
+    if POSE_SAMPLING_OVERRIDE:
+        return SamplingPolicy.parse(POSE_SAMPLING_OVERRIDE)
+    return default or SamplingPolicy.all_frames()
+
+
+# --- Inference Preprocessing ---
+def downscale_frame(frame: np.ndarray, max_dimension: int = INFERENCE_MAX_DIMENSION) -> np.ndarray:
+    """Shrinks a frame so its longer side is at most `max_dimension`, keeping the aspect ratio."""
+    height, width = frame.shape[:2]
+    scale = max_dimension / max(height, width)
+    if scale >= 1.0:
+        return frame
+    return cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+class RGBConverter:
+    """Converts BGR frames to RGB into one reused buffer instead of allocating a new image per frame."""
+
+    def __init__(self):
+        self._buffer = None
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        if self._buffer is None or self._buffer.shape != frame.shape:
+            self._buffer = np.empty_like(frame)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._buffer)
+
+
+class ROITracker:
+    """
+    Per-video state for cropping inference input to the athlete.
+
+    The crop is the previous frame's landmarks plus ROI_PADDING, and is left
+    where it is while the athlete stays well inside it, so that MediaPipe's own
+    frame-to-frame tracking sees a steady image. Without a usable pose (the
+    first frame, or after the athlete was lost) the whole frame is used.
+    """
+
+    def __init__(self, padding: float = ROI_PADDING):
+        self.padding = padding
+        self.box = None  # (x0, y0, x1, y1), normalized to the full frame
+        self._margin = (0.0, 0.0)
+        self.cropped_frames = 0
+        self.lost_frames = 0
+
+    def crop(self, frame: np.ndarray) -> tuple:
+        """
+        Cuts the current region out of a full-resolution frame and downscales it for inference.
+
+        Returns:
+            tuple: (image to infer on, pixel box (x0, y0, x1, y1) it was cut from, or None for the whole frame)
+        """
+        if self.box is None:
+            return downscale_frame(frame), None
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = self.box
+        pixels = (int(x0 * width), int(y0 * height), max(int(x0 * width) + 1, round(x1 * width)),
+                  max(int(y0 * height) + 1, round(y1 * height)))
+        self.cropped_frames += 1
+        return downscale_frame(frame[pixels[1]:pixels[3], pixels[0]:pixels[2]]), pixels
+
+    def lost(self):
+        """Falls back to the whole frame after the crop missed the athlete."""
+        self.box = None
+        self.lost_frames += 1
+
+    @staticmethod
+    def to_frame(keypoints: np.ndarray, pixels: tuple, frame_shape: tuple) -> np.ndarray:
+        """Maps (33, 4) landmarks normalized to a crop back to the full frame, in place."""
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = pixels
+        keypoints[:, 0] = (x0 + keypoints[:, 0] * (x1 - x0)) / width
+        keypoints[:, 1] = (y0 + keypoints[:, 1] * (y1 - y0)) / height
+        # MediaPipe's z is on roughly the same scale as x.
+        keypoints[:, 2] *= (x1 - x0) / width
+        return keypoints
+
+    def update(self, keypoints: np.ndarray | None, frame_shape: tuple):
+        """Places the region for the next frame from this frame's full-frame landmarks, or None if there were none."""
+        visible = keypoints[keypoints[:, 3] >= ROI_MIN_VISIBILITY, :2] if keypoints is not None else None
+        if visible is None or len(visible) < 2:
+            self.box = None
+            return
+        (px0, py0), (px1, py1) = visible.min(axis=0), visible.max(axis=0)
+        if self.box is not None:
+            # Keep the crop while the pose stays clear of its edges by at least half the padding.
+            x0, y0, x1, y1 = self.box
+            margin_x, margin_y = self._margin
+            if px0 >= x0 + margin_x and px1 <= x1 - margin_x and py0 >= y0 + margin_y and py1 <= y1 - margin_y:
+                return
+
+        # Padded in pixels, so the margin is the same on both axes.
+        height, width = frame_shape[:2]
+        pad = self.padding * max((px1 - px0) * width, (py1 - py0) * height)
+        min_size = _ROI_MIN_SIZE * max(width, height)
+        half_w = max((px1 - px0) * width + 2 * pad, min_size) / 2 / width
+        half_h = max((py1 - py0) * height + 2 * pad, min_size) / 2 / height
+        cx, cy = (px0 + px1) / 2, (py0 + py1) / 2
+        box = (max(0.0, cx - half_w), max(0.0, cy - half_h), min(1.0, cx + half_w), min(1.0, cy + half_h))
+        self.box = box if (box[2] - box[0]) * (box[3] - box[1]) <= _ROI_MAX_AREA else None
+        self._margin = (pad / 2 / width, pad / 2 / height)
+
+
+# --- Decode Stage ---
+_END_OF_STREAM = object()
+
+
+def _put_until_stopped(frames: queue.Queue, item, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            frames.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _decode_worker(cap, frames: queue.Queue, stop: threading.Event, sampler: FrameSampler | None,
+                   first_index: int, max_frames: int | None, downscale: bool = True):
+    """
+    Reads frames from the capture into the bounded queue until the stream ends, `max_frames`
+    have been read or the consumer stops.
+    Frames are downscaled for inference here, once, so the queue only ever holds small frames,
+    unless the consumer needs them at full resolution (ROI tracking crops them itself).
+    Frames the sampler skips are queued as None so their timestamps are still recorded.
+    """
+    # Time spent decoding, excluding time blocked on a full queue while inference catches up.
+    busy_seconds = 0.0
+    index = first_index
+    try:
+        stop_index = first_index + max_frames if max_frames is not None else None
+        while not stop.is_set() and index != stop_index:
+            start = time.perf_counter()
+            if not cap.grab():
+                break
+            timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            frame = None
+            if sampler is None or sampler.needs_pixels(index):
+                success, frame = cap.retrieve()
+                if not success:
+                    break
+                if downscale:
+                    frame = downscale_frame(frame)
+                if sampler is not None and not sampler.select(index, frame):
+                    frame = None
+            busy_seconds += time.perf_counter() - start
+            _put_until_stopped(frames, (frame, timestamp_ms), stop)
+            index += 1
+    except Exception as e:
+        _put_until_stopped(frames, e, stop)
+    finally:
+        cap.release()
+        metrics.record_span("decode", busy_seconds, frames=index - first_index)
+        _put_until_stopped(frames, _END_OF_STREAM, stop)
+
+
+def iter_decoded_frames(cap, sampler: FrameSampler | None = None, first_index: int = 0, max_frames: int | None = None,
+                        full_resolution: bool = False):
+    """
+    Yields frames from an opened cv2.VideoCapture, decoding them on a separate
+    thread so the next frames are ready while the caller runs inference.
+
+    Args:
+        cap (cv2.VideoCapture): An opened capture. It is released when decoding ends.
+        sampler (FrameSampler | None): Decides which frames to pass on. All frames if None.
+        first_index (int): Index in the video of the capture's current frame, when it was seeked.
+        max_frames (int | None): Stop after this many frames. Reads to the end if None.
+        full_resolution (bool): Yield frames as decoded instead of downscaled for inference.
+
+    Yields:
+        tuple: (BGR frame downscaled for inference, or None if the sampler
+        skipped it, presentation timestamp in ms) in presentation order.
+    """
+    frames = queue.Queue(maxsize=min(DECODE_QUEUE_SIZE, _FULL_RESOLUTION_QUEUE_SIZE) if full_resolution else DECODE_QUEUE_SIZE)
+    stop = threading.Event()
+    decoder = threading.Thread(target=_decode_worker, args=(cap, frames, stop, sampler, first_index, max_frames,
+                                                            not full_resolution), name="frame-decoder", daemon=True)
+    decoder.start()
+    try:
+        while True:
+            item = frames.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        decoder.join()
+
+
+def extract_keypoints_from_video(video_path: str, sampling: SamplingPolicy | None = None,
+                                 model_variant: str | None = None, segmentation_masks: bool = False) -> PoseSequence:
+    """
+    Extracts pose keypoints from a video file using the MediaPipe Tasks API in VIDEO mode.
+    Decoding runs on its own thread (see `iter_decoded_frames`) so it overlaps with inference.
 
     Args:
-        video_path (str): The local path to the video file.
+        video_path (str): The local path to the video file, or an http(s) URL
+            to decode progressively while it is still being downloaded.
+        sampling (SamplingPolicy | None): Which frames to run inference on.
+            Defaults to every frame. Landmarks of skipped frames are interpolated.
+        model_variant (str | None): "lite", "full" or "heavy". Defaults to POSE_MODEL_VARIANT.
+        segmentation_masks (bool): Also collect the athlete's segmentation mask for
+            each inferred frame. Off by default since it costs a mask per frame.
 
     Returns:
-        list: A list of landmark data for each frame where a pose is detected.
+        PoseSequence: The landmarks of every frame, with frames where no pose
+            was detected marked invalid. Empty if the video couldn't be opened,
+            or if a streamed URL ended before all of its frames arrived.
+
+    Raises:
+        VideoRejectedError: If the video is longer than MAX_VIDEO_DURATION_SECONDS.
     """
     if not video_path:
-        return []
-
-    # --- Setup the new PoseLandmarker ---
-    # Create a PoseLandmarker object by loading the pre-trained model.
-    base_options = python.BaseOptions(model_asset_path='pose_landmarker_heavy.task')
-    options = vision.PoseLandmarkerOptions(
-        base_options=base_options,
-        output_segmentation_masks=True)
-    landmarker = vision.PoseLandmarker.create_from_options(options)
-    # --- End of setup ---
+        return PoseSequence.empty()
 
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error: Could not open video file {video_path}")
-        return []
-        
-    all_frame_landmarks = []
+        return PoseSequence.empty()
+    try:
+        check_capture_duration(cap)
+    except Exception:
+        cap.release()
+        raise
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or None
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    sampling = sampling or SamplingPolicy.all_frames()
+
+    chunks = _plan_chunks(video_path, fps, frame_count, segmentation_masks)
+    if chunks:
+        cap.release()
+        with metrics.span("extraction", chunks=len(chunks)) as extraction:
+            pose_sequence = _extract_chunks_in_parallel(video_path, chunks, fps, frame_count, sampling, model_variant)
+            extraction["frames"] = len(pose_sequence)
+        return pose_sequence
+
+    builder = PoseSequenceBuilder(fps=fps, capacity=frame_count if frame_count > 0 else 256)
+    masks = [] if segmentation_masks else None
+    # Masks have to cover the whole frame, so they rule out cropping.
+    roi = ROITracker() if ROI_TRACKING and not segmentation_masks else None
+    with metrics.span("extraction") as extraction, \
+            get_landmarker_pool(model_variant, segmentation_masks).checkout() as landmarker:
+        frames = iter_decoded_frames(cap, FrameSampler(sampling, fps), full_resolution=roi is not None)
+        inferred_frames = _run_landmarker(frames, landmarker, builder, masks, roi=roi)
+        extraction["frames"] = len(builder)
+
+    # A dropped connection just ends the stream, so check that the whole video came through.
+    if (video_path.startswith(("http://", "https://")) and frame_count > 0
+            and len(builder) < frame_count * _STREAM_MIN_FRAME_FRACTION):
+        print(f"Warning: Stream of {video_path} ended after {len(builder)} of {frame_count} frames.")
+        return PoseSequence.empty()
+
+    pose_sequence = builder.build()
+    pose_sequence.segmentation_masks = masks
+    cropped = f", {roi.cropped_frames} cropped to the athlete" if roi is not None else ""
+    print(f"Extracted keypoints from {len(pose_sequence)} frames ({inferred_frames} inferred{cropped}, sampling={sampling}).")
+    return pose_sequence
+
+
+def _run_landmarker(frames, landmarker: VideoLandmarker, builder: PoseSequenceBuilder, masks: list | None,
+                    stage: str = "inference", roi: ROITracker | None = None) -> int:
+    """
+    Runs every frame from `iter_decoded_frames` through the landmarker into the builder,
+    and records the time spent in inference as a metrics span for `stage`.
+
+    With a ROITracker, frames must be full resolution; each is cropped to the
+    athlete before inference, and retried on the whole frame if the crop lost them.
+
+    Returns:
+        int: The number of frames that were inferred rather than skipped.
+    """
+    import mediapipe as mp
 
-    while cap.isOpened():
-        success, frame = cap.read()
-        if not success:
-            break
+    to_rgb = RGBConverter()
+    inferred_frames = 0
+    busy_seconds = 0.0
+    for frame, timestamp_ms in frames:
+        if frame is None:
+            builder.append_skipped(timestamp_ms)
+            if masks is not None:
+                masks.append(None)
+            continue
+        inferred_frames += 1
+
+        image, crop_box = roi.crop(frame) if roi is not None else (frame, None)
 
         # Convert the OpenCV frame (BGR) to RGB, then create a MediaPipe Image object.
-        frame_rgb = cv.cvtColor(frame, cv.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
-        
-        # Process the frame to find pose landmarks.
-        detection_result = landmarker.detect(mp_image)
-        
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=to_rgb(image))
+
+        # Process the frame to find pose landmarks, tracking from the previous frame.
+        start = time.perf_counter()
+        detection_result = landmarker.detect(mp_image, timestamp_ms)
+        busy_seconds += time.perf_counter() - start
+
+        if crop_box is not None and not detection_result.pose_landmarks:
+            # The athlete left the crop: look for them in the whole frame straight away.
+            roi.lost()
+            image, crop_box = roi.crop(frame)
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=to_rgb(image))
+            start = time.perf_counter()
+            detection_result = landmarker.detect(mp_image, timestamp_ms)
+            busy_seconds += time.perf_counter() - start
+
         # The result may contain multiple detected poses. We'll take the first one.
-        if detection_result.pose_landmarks:
+        if detection_result.pose_landmarks and roi is not None:
+            keypoints = np.array([(lm.x, lm.y, lm.z, lm.visibility if lm.visibility is not None else 0.0)
+                                  for lm in detection_result.pose_landmarks[0]], dtype=np.float32)
+            if crop_box is not None:
+                ROITracker.to_frame(keypoints, crop_box, frame.shape)
+            roi.update(keypoints, frame.shape)
+            builder.append(keypoints, timestamp_ms)
+        elif detection_result.pose_landmarks:
             # Get landmarks for the first detected person in the frame.
-            all_frame_landmarks.append(detection_result.pose_landmarks[0]) 
+            builder.append(detection_result.pose_landmarks[0], timestamp_ms)
         else:
-            all_frame_landmarks.append(None)
-            
-    cap.release()
-    print(f"Extracted keypoints from {len(all_frame_landmarks)} frames.")
-    return all_frame_landmarks
\ No newline at end of file
+            if roi is not None:
+                roi.update(None, frame.shape)
+            builder.append(None, timestamp_ms)
+
+        if masks is not None:
+            masks.append(detection_result.segmentation_masks[0].numpy_view().copy()
+                         if detection_result.segmentation_masks else None)
+    metrics.record_span(stage, busy_seconds, frames=inferred_frames)
+    return inferred_frames
+
+
+def extract_keypoints_from_images(images: list, landmarker: VideoLandmarker, fps: float | None = None,
+                                  roi: ROITracker | None = None) -> PoseSequence:
+    """
+    Runs pose inference on individually encoded frames, e.g. ones streamed live
+    from a phone, continuing the tracking state of `landmarker`.
+
+    Args:
+        images (list): (encoded JPEG/PNG bytes, capture timestamp in ms) pairs, in order.
+        landmarker (VideoLandmarker): A landmarker checked out for the whole stream.
+        fps (float | None): Nominal frame rate, used if timestamps don't increase.
+        roi (ROITracker | None): Crops each image to the athlete. Keep one per stream,
+            so the crop carries over from one call to the next.
+
+    Returns:
+        PoseSequence: One entry per image. Images that fail to decode count as frames without a pose.
+    """
+    def decoded():
+        for data, timestamp_ms in images:
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                builder.append(None, timestamp_ms)
+                continue
+            # The tracker crops full-resolution frames itself.
+            yield (frame if roi is not None else downscale_frame(frame)), timestamp_ms
+
+    builder = PoseSequenceBuilder(fps=fps, capacity=len(images))
+    _run_landmarker(decoded(), landmarker, builder, None, stage="live_inference", roi=roi)
+    return builder.build()
+
+
+# --- Parallel Extraction ---
+_chunk_executor: ProcessPoolExecutor | None = None
+
+
+def _get_chunk_executor() -> ProcessPoolExecutor:
+    global _chunk_executor
+    with _pool_lock:
+        if _chunk_executor is None:
+            # Spawn, not fork: MediaPipe's native threads don't survive a fork.
+            _chunk_executor = ProcessPoolExecutor(max_workers=PARALLEL_EXTRACTION_WORKERS,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+        return _chunk_executor
+
+
+def _plan_chunks(video_path: str, fps: float | None, frame_count: int, segmentation_masks: bool) -> list:
+    """
+    Splits a long local video into contiguous frame ranges, one per extraction process.
+    Returns an empty list when the video should be extracted in a single pass.
+    """
+    if (PARALLEL_EXTRACTION_WORKERS < 2 or segmentation_masks or not fps or frame_count <= 0
+            or video_path.startswith(("http://", "https://"))
+            or frame_count / fps < PARALLEL_EXTRACTION_MIN_SECONDS):
+        return []
+    chunk_length = math.ceil(frame_count / PARALLEL_EXTRACTION_WORKERS)
+    starts = range(0, frame_count, chunk_length)
+    # The container's frame count is only an estimate, so the last chunk reads to the end of the stream.
+    return [(start, start + chunk_length if start + chunk_length < frame_count else None) for start in starts]
+
+
+def _extract_chunk(video_path: str, start: int, stop: int | None, fps: float, sampling: SamplingPolicy,
+                   model_variant: str | None, output: tuple) -> tuple:
+    """
+    Extracts frames [start, stop) of a video in a chunk worker process, or from
+    `start` to the end if `stop` is None. Decoding
+    starts CHUNK_OVERLAP_FRAMES early and runs as far past the end, and the
+    overlap is trimmed off the result.
+
+    The frames are written straight into the parent's SharedPoseBuffer (given
+    by its `output` handle) at their position in the video, so only a frame
+    count travels back through the executor.
+
+    Returns:
+        tuple: (frames written, overflow), where overflow holds (keypoints, valid, timestamps_ms)
+            for any frames past the end of the buffer, or is None.
+    """
+    first = max(0, start - CHUNK_OVERLAP_FRAMES)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file {video_path} in chunk worker.")
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    max_frames = stop + CHUNK_OVERLAP_FRAMES - first if stop is not None else None
+    builder = PoseSequenceBuilder(fps=fps, capacity=max_frames or 256)
+    roi = ROITracker() if ROI_TRACKING else None
+    with get_landmarker_pool(model_variant).checkout() as landmarker:
+        frames = iter_decoded_frames(cap, FrameSampler(sampling, fps), first_index=first, max_frames=max_frames,
+                                     full_resolution=roi is not None)
+        _run_landmarker(frames, landmarker, builder, None, roi=roi)
+
+    chunk = builder.build()
+    keep = slice(start - first, stop - first if stop is not None else None)
+    keypoints, valid, timestamps_ms = chunk.keypoints[keep], chunk.valid[keep], chunk.timestamps_ms[keep]
+    with SharedPoseBuffer.attach(output) as buffer:
+        written = buffer.write(start, keypoints, valid, timestamps_ms)
+    # Only the last chunk can run past the buffer, when the container under-reported its frame count.
+    overflow = (keypoints[written:], valid[written:], timestamps_ms[written:]) if written < len(keypoints) else None
+    return written, overflow
+
+
+def _stitch_chunks(buffer: SharedPoseBuffer, segments: list, fps: float) -> tuple:
+    """
+    Concatenates the chunks' frames in order, copying them out of the shared buffer
+    so none of the returned arrays keep it mapped.
+
+    Returns:
+        tuple: (keypoints, valid, timestamps_ms) arrays for the whole video.
+    """
+    parts = []
+    for start, written, overflow in segments:
+        stop = start + written
+        parts.append((buffer.keypoints[start:stop], buffer.valid[start:stop], buffer.timestamps_ms[start:stop]))
+        if overflow is not None:
+            parts.append(overflow)
+
+    keypoints = np.concatenate([part[0] for part in parts])
+    valid = np.concatenate([part[1] for part in parts])
+    timestamps = []
+    for _, _, chunk_timestamps in parts:
+        # Seeking can leave a chunk's reported times out of line with the one before it;
+        # fall back to the frame rate to keep the stitched timeline increasing.
+        if timestamps and len(chunk_timestamps) and chunk_timestamps[0] <= timestamps[-1][-1]:
+            chunk_timestamps = chunk_timestamps - chunk_timestamps[0] + timestamps[-1][-1] + 1000.0 / fps
+        if len(chunk_timestamps):
+            timestamps.append(chunk_timestamps)
+    return keypoints, valid, np.concatenate(timestamps) if timestamps else np.zeros(0)
+
+
+def _extract_chunks_in_parallel(video_path: str, chunks: list, fps: float, frame_count: int,
+                                sampling: SamplingPolicy, model_variant: str | None) -> PoseSequence:
+    """
+    Extracts each frame range in its own process and stitches the results back together in order.
+    The chunk workers hand their landmarks back through one shared memory buffer rather than
+    pickling them, which is unlinked again once the stitched sequence has been copied out.
+    """
+    # An in-memory video is only reachable through this process's file descriptor table.
+    video_path = video_path.replace("/proc/self/", f"/proc/{os.getpid()}/", 1)
+    executor = _get_chunk_executor()
+    # Some slack over the container's estimate, so the last chunk rarely has to fall back to pickling.
+    with SharedPoseBuffer.create(frame_count + CHUNK_OVERLAP_FRAMES + frame_count // 50) as buffer:
+        futures = [executor.submit(metrics.run_collecting_spans, _extract_chunk, video_path, start, stop, fps,
+                                   sampling, model_variant, buffer.handle) for start, stop in chunks]
+        segments = []
+        for (start, _), future in zip(chunks, futures):
+            (written, overflow), spans = future.result()
+            metrics.replay(spans)
+            segments.append((start, written, overflow))
+        keypoints, valid, timestamps = _stitch_chunks(buffer, segments, fps)
+    pose_sequence = PoseSequence(keypoints, valid, timestamps, fps)
+    print(f"Extracted keypoints from {len(pose_sequence)} frames in {len(chunks)} parallel chunks (sampling={sampling}).")
+    return pose_sequence
@@ -0,0 +1,100 @@
+import numpy as np
+
+from utils.math_utils import calculate_angles, velocities
+
+
+class PoseFeatures:
+    """
+    Quantities derived from a PoseSequence (landmark tracks, midpoints, joint
+    angles, velocities, smoothed trajectories), each computed on first use and
+    kept for the life of the sequence. Every analyzer run on the same sequence,
+    e.g. all the tests of one job, shares them through `pose.features`.
+
+    Everything is over the frames where a pose was detected, like
+    `pose.valid_keypoints`. Returned arrays are shared, so they are read-only.
+    Landmarks are given as a PoseLandmark index, or a tuple of indices to
+    average, e.g. both hips.
+    """
+
+    def __init__(self, pose):
+        self._pose = pose
+        self._cache = {}
+
+    def _memoized(self, key: tuple, compute) -> np.ndarray:
+        value = self._cache.get(key)
+        if value is None:
+            value = compute()
+            value.flags.writeable = False
+            self._cache[key] = value
+        return value
+
+    @property
+    def keypoints(self) -> np.ndarray:
+        """Keypoints of the frames with a detected pose, shape (frames, 33, 4)."""
+        return self._memoized(("keypoints",), lambda: self._pose.keypoints[self._pose.valid])
+
+    @property
+    def timestamps_ms(self) -> np.ndarray:
+        return self._memoized(("timestamps_ms",), lambda: self._pose.timestamps_ms[self._pose.valid])
+
+    def track(self, landmarks: int | tuple, channel: int) -> np.ndarray:
+        """
+        One channel (X, Y, Z or VISIBILITY) of a landmark, or the mean of
+        several landmarks, in every frame. Shape (frames,).
+        """
+        if isinstance(landmarks, tuple) and len(landmarks) == 1:
+            landmarks = landmarks[0]
+        if isinstance(landmarks, tuple):
+            return self._memoized(("track", landmarks, channel),
+                                  lambda: self.keypoints[:, list(landmarks), channel].mean(axis=1))
+        return self._memoized(("track", landmarks, channel), lambda: self.keypoints[:, landmarks, channel])
+
+    def midpoint(self, a: int, b: int, channel: int) -> np.ndarray:
+        """One channel of the point halfway between two landmarks, e.g. the hip centre."""
+        return self.track((a, b), channel)
+
+    def angle(self, a: int, vertex: int, c: int) -> np.ndarray:
+        """
+        The 2D angle in degrees at `vertex` between the segments to `a` and `c`
+        in every frame, e.g. the knee angle from hip, knee and ankle. NaN where
+        a segment has zero length.
+        """
+        def compute():
+            points = self.keypoints[:, [a, vertex, c], :2]
+            return calculate_angles(points[:, 0], points[:, 1], points[:, 2])
+        return self._memoized(("angle", a, vertex, c), compute)
+
+    def _window(self, window_ms: float) -> int:
+        """How many frames span `window_ms` at the sequence's typical frame interval."""
+        if len(self.timestamps_ms) < 2:
+            return 1
+        frame_ms = float(np.median(np.diff(self.timestamps_ms)))
+        return max(1, int(round(window_ms / frame_ms))) if frame_ms > 0 else 1
+
+    def smoothed(self, landmarks: int | tuple, channel: int, window_ms: float) -> np.ndarray:
+        """A track averaged over a moving window of `window_ms`, same length as the track."""
+        def compute():
+            track = self.track(landmarks, channel)
+            window = self._window(window_ms)
+            if window == 1 or len(track) < window:
+                return track.copy()
+            # Edge frames are padded with their own value so the ends aren't pulled towards zero.
+            padded = np.pad(track, (window // 2, window - 1 - window // 2), mode="edge")
+            return np.convolve(padded, np.ones(window) / window, mode="valid")
+        return self._memoized(("smoothed", landmarks, channel, window_ms), compute)
+
+    def velocity(self, landmarks: int | tuple, channel: int) -> np.ndarray:
+        """Frame-to-frame velocity of a track in units per second, shape (frames - 1,)."""
+        return self._memoized(("velocity", landmarks, channel),
+                              lambda: velocities(self.track(landmarks, channel), self.timestamps_ms))
+
+    def speed(self, landmarks: int | tuple, channel: int, smoothing_ms: float) -> np.ndarray:
+        """
+        Absolute velocity of a track averaged over a moving window of `smoothing_ms`,
+        keeping only fully covered windows. Frames with no elapsed time count as zero.
+        """
+        def compute():
+            speeds = np.nan_to_num(np.abs(self.velocity(landmarks, channel)))
+            window = self._window(smoothing_ms)
+            return np.convolve(speeds, np.ones(window) / window, mode="valid")
+        return self._memoized(("speed", landmarks, channel, smoothing_ms), compute)
@@ -0,0 +1,201 @@
+from collections import namedtuple
+
+import numpy as np
+
+from utils.pose_features import PoseFeatures
+
+# MediaPipe's pose model always returns 33 landmarks per person.
+NUM_LANDMARKS = 33
+
+# Channel indices into the last axis of PoseSequence.keypoints.
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+
+# Lightweight stand-in for a MediaPipe landmark, for code that still reads `.x`/`.y`.
+Landmark = namedtuple("Landmark", ["x", "y", "z", "visibility"])
+
+
+class PoseSequence:
+    """
+    The pose of a single athlete over a whole video, stored as one dense array.
+
+    Attributes:
+        keypoints (np.ndarray): float32 array of shape (frames, 33, 4) holding
+            x, y, z and visibility for every landmark. Rows for frames without
+            a detected pose are zero.
+        valid (np.ndarray): bool array of shape (frames,), True where a pose was detected.
+        timestamps_ms (np.ndarray): float64 array of shape (frames,) with each
+            frame's presentation time in milliseconds.
+        fps (float | None): The source video's nominal frame rate, if known.
+        segmentation_masks (list | None): Per-frame float32 masks (None for frames
+            that weren't inferred). Only present when extraction was asked for them.
+    """
+
+    def __init__(self, keypoints: np.ndarray, valid: np.ndarray, timestamps_ms: np.ndarray, fps: float | None = None,
+                 segmentation_masks: list | None = None):
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        if keypoints.ndim != 3 or keypoints.shape[1:] != (NUM_LANDMARKS, 4):
+            raise ValueError(f"Keypoints must have shape (frames, {NUM_LANDMARKS}, 4), got {keypoints.shape}.")
+        valid = np.asarray(valid, dtype=bool)
+        timestamps_ms = np.asarray(timestamps_ms, dtype=np.float64)
+        if valid.shape != (len(keypoints),) or timestamps_ms.shape != (len(keypoints),):
+            raise ValueError("Validity mask and timestamps must have one entry per frame.")
+        self.keypoints = keypoints
+        self.valid = valid
+        self.timestamps_ms = timestamps_ms
+        self.fps = fps
+        self.segmentation_masks = segmentation_masks
+        self._features = None
+
+    @classmethod
+    def empty(cls, fps: float | None = None) -> "PoseSequence":
+        return cls(np.zeros((0, NUM_LANDMARKS, 4), dtype=np.float32), np.zeros(0, dtype=bool), np.zeros(0), fps)
+
+    @classmethod
+    def from_landmark_lists(cls, frames: list, timestamps_ms=None, fps: float | None = None) -> "PoseSequence":
+        """
+        Builds a sequence from per-frame lists of MediaPipe landmarks (or None
+        for frames without a pose), the format the pose extractor used to return.
+        """
+        builder = PoseSequenceBuilder(fps=fps, capacity=len(frames))
+        for i, landmarks in enumerate(frames):
+            timestamp = timestamps_ms[i] if timestamps_ms is not None else None
+            builder.append(landmarks, timestamp)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.keypoints)
+
+    @property
+    def num_valid(self) -> int:
+        """Number of frames with a detected pose."""
+        return int(self.valid.sum())
+
+    @property
+    def valid_keypoints(self) -> np.ndarray:
+        """Keypoints of the frames with a detected pose, shape (num_valid, 33, 4)."""
+        return self.keypoints[self.valid]
+
+    @property
+    def valid_timestamps_ms(self) -> np.ndarray:
+        return self.timestamps_ms[self.valid]
+
+    @property
+    def features(self) -> PoseFeatures:
+        """
+        The PoseFeatures store for this sequence: derived tracks, angles and velocities,
+        computed once and shared by every analyzer that reads them.
+        """
+        if self._features is None:
+            self._features = PoseFeatures(self)
+        return self._features
+
+    def landmark(self, index: int, valid_only: bool = True) -> np.ndarray:
+        """Returns the (frames, 4) track of a single landmark."""
+        track = self.keypoints[:, index, :]
+        return track[self.valid] if valid_only else track
+
+    def frame_landmarks(self, frame_index: int) -> list | None:
+        """Returns one frame as a list of `Landmark` tuples, or None if no pose was detected."""
+        if not self.valid[frame_index]:
+            return None
+        return [Landmark(*map(float, row)) for row in self.keypoints[frame_index]]
+
+
+class PoseSequenceBuilder:
+    """
+    Accumulates per-frame detections into a PoseSequence without keeping the
+    MediaPipe landmark objects alive. Storage grows geometrically, so appending
+    is amortised O(1).
+    """
+
+    def __init__(self, fps: float | None = None, capacity: int = 256):
+        self.fps = fps
+        capacity = max(1, capacity)
+        self._keypoints = np.zeros((capacity, NUM_LANDMARKS, 4), dtype=np.float32)
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._timestamps_ms = np.zeros(capacity, dtype=np.float64)
+        self._skipped = np.zeros(capacity, dtype=bool)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        capacity = len(self._keypoints) * 2
+        self._keypoints = np.resize(self._keypoints, (capacity, NUM_LANDMARKS, 4))
+        self._valid = np.resize(self._valid, capacity)
+        self._timestamps_ms = np.resize(self._timestamps_ms, capacity)
+        self._skipped = np.resize(self._skipped, capacity)
+
+    def _next_timestamp(self, timestamp_ms: float | None) -> float:
+        # Fall back to the nominal frame rate when the container doesn't report a usable time.
+        if self._size == 0:
+            return float(timestamp_ms or 0.0)
+        previous = self._timestamps_ms[self._size - 1]
+        if timestamp_ms is None or timestamp_ms <= previous:
+            return previous + (1000.0 / self.fps if self.fps else 1.0)
+        return float(timestamp_ms)
+
+    def append(self, landmarks, timestamp_ms: float | None = None):
+        """
+        Adds one frame.
+
+        Args:
+            landmarks: The frame's landmarks as a list of objects with x/y/z/visibility,
+                a (33, 4) array, or None if no pose was detected.
+            timestamp_ms (float | None): The frame's presentation time.
+        """
+        if self._size == len(self._keypoints):
+            self._grow()
+        i = self._size
+        self._timestamps_ms[i] = self._next_timestamp(timestamp_ms)
+        self._skipped[i] = False
+        if landmarks is None or len(landmarks) == 0:
+            self._keypoints[i] = 0.0
+            self._valid[i] = False
+        elif isinstance(landmarks, np.ndarray):
+            self._keypoints[i] = landmarks
+            self._valid[i] = True
+        else:
+            self._keypoints[i] = [
+                (lm.x, lm.y, lm.z, lm.visibility if lm.visibility is not None else 0.0)
+                for lm in landmarks
+            ]
+            self._valid[i] = True
+        self._size += 1
+
+    def append_skipped(self, timestamp_ms: float | None = None):
+        """Adds a frame that was decoded but not inferred. It is filled in by interpolation on `build`."""
+        self.append(None, timestamp_ms)
+        self._skipped[self._size - 1] = True
+
+    def build(self) -> PoseSequence:
+        n = self._size
+        keypoints = self._keypoints[:n].copy()
+        valid = self._valid[:n].copy()
+        timestamps_ms = self._timestamps_ms[:n].copy()
+        _interpolate_skipped(keypoints, valid, self._skipped[:n], timestamps_ms)
+        return PoseSequence(keypoints, valid, timestamps_ms, self.fps)
+
+
+def _interpolate_skipped(keypoints: np.ndarray, valid: np.ndarray, skipped: np.ndarray, timestamps_ms: np.ndarray):
+    """
+    Linearly interpolates, in place and in time, the skipped frames that sit
+    between two inferred frames with a detected pose. Skipped frames at the
+    edges or next to a missed detection stay invalid.
+    """
+    inferred = np.flatnonzero(~skipped)
+    holes = np.flatnonzero(skipped)
+    if not holes.size or not inferred.size:
+        return
+    after = np.searchsorted(inferred, holes)
+    inside = (after > 0) & (after < len(inferred))
+    holes, after = holes[inside], after[inside]
+    prev, nxt = inferred[after - 1], inferred[after]
+    bracketed = valid[prev] & valid[nxt]
+    holes, prev, nxt = holes[bracketed], prev[bracketed], nxt[bracketed]
+
+    weights = (timestamps_ms[holes] - timestamps_ms[prev]) / (timestamps_ms[nxt] - timestamps_ms[prev])
+    weights = weights.astype(np.float32)[:, None, None]
+    keypoints[holes] = keypoints[prev] + weights * (keypoints[nxt] - keypoints[prev])
+    valid[holes] = True
@@ -0,0 +1,85 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.pose_sequence import NUM_LANDMARKS
+
+
+class SharedPoseBuffer:
+    """
+    PoseSequence-shaped arrays (keypoints, valid, timestamps_ms) for up to
+    `capacity` frames in one shared memory block, so processes can exchange
+    pose data by passing a small handle instead of pickling the arrays.
+
+    The process that creates the buffer owns it and must `unlink` it when
+    done; every process, owner included, must `close` its own mapping.
+    Use it as a context manager to get both right:
+
+        with SharedPoseBuffer.create(frames) as buffer:       # owner
+            submit(worker, buffer.handle)
+            ...                                               # copy out before the block closes
+
+        with SharedPoseBuffer.attach(handle) as buffer:       # worker
+            buffer.write(offset, keypoints, valid, timestamps_ms)
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, owner: bool):
+        self._shm = shm
+        self.capacity = capacity
+        self.owner = owner
+        # Laid out widest dtype first so every array is naturally aligned.
+        timestamps_bytes = capacity * 8
+        keypoints_bytes = capacity * NUM_LANDMARKS * 4 * 4
+        self.timestamps_ms = np.ndarray((capacity,), dtype=np.float64, buffer=shm.buf)
+        self.keypoints = np.ndarray((capacity, NUM_LANDMARKS, 4), dtype=np.float32, buffer=shm.buf,
+                                    offset=timestamps_bytes)
+        self.valid = np.ndarray((capacity,), dtype=bool, buffer=shm.buf, offset=timestamps_bytes + keypoints_bytes)
+
+    @staticmethod
+    def _size(capacity: int) -> int:
+        return capacity * (8 + NUM_LANDMARKS * 4 * 4 + 1)
+
+    @classmethod
+    def create(cls, capacity: int) -> "SharedPoseBuffer":
+        capacity = max(1, capacity)
+        return cls(shared_memory.SharedMemory(create=True, size=cls._size(capacity)), capacity, owner=True)
+
+    @classmethod
+    def attach(cls, handle: tuple) -> "SharedPoseBuffer":
+        """Maps a buffer created by another process from its `handle`."""
+        name, capacity = handle
+        return cls(shared_memory.SharedMemory(name=name), capacity, owner=False)
+
+    @property
+    def handle(self) -> tuple:
+        """A small picklable reference to pass to other processes."""
+        return self._shm.name, self.capacity
+
+    def write(self, offset: int, keypoints: np.ndarray, valid: np.ndarray, timestamps_ms: np.ndarray) -> int:
+        """
+        Copies frames into the buffer starting at frame `offset`.
+
+        Returns:
+            int: How many frames fitted. The rest have to be passed back some other way.
+        """
+        count = max(0, min(len(keypoints), self.capacity - offset))
+        self.keypoints[offset:offset + count] = keypoints[:count]
+        self.valid[offset:offset + count] = valid[:count]
+        self.timestamps_ms[offset:offset + count] = timestamps_ms[:count]
+        return count
+
+    def close(self):
+        # The array views hold exports of the mapping; drop them before closing it.
+        self.keypoints = self.valid = self.timestamps_ms = None
+        self._shm.close()
+
+    def unlink(self):
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        self.unlink()
@@ -1,34 +1,308 @@
 import os
+import struct
+import threading
+import time
 import uuid
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import cv2
 import requests
+from requests.adapters import HTTPAdapter
+
+# When enabled, frames are decoded straight from the video URL while it downloads,
+# and the full download to disk is only used as a fallback. Only takes effect while
+# the keypoint cache is disabled (KEYPOINT_CACHE_MAX_BYTES=0, the default), since the
+# cache needs the whole file's hash before extraction.
+STREAM_FROM_URL = os.getenv("STREAM_FROM_URL", "true").lower() == "true"
+
+# --- Download Configuration ---
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "30"))
+# How many times an interrupted download is resumed with an HTTP Range request.
+DOWNLOAD_MAX_RESUMES = int(os.getenv("DOWNLOAD_MAX_RESUMES", "3"))
+# Simultaneous downloads allowed from one host, per worker process.
+DOWNLOAD_CONCURRENCY_PER_ORIGIN = int(os.getenv("DOWNLOAD_CONCURRENCY_PER_ORIGIN", "4"))
+MAX_VIDEO_BYTES = int(os.getenv("MAX_VIDEO_BYTES", str(500 * 1024 * 1024)))
+MAX_VIDEO_DURATION_SECONDS = float(os.getenv("MAX_VIDEO_DURATION_SECONDS", "600"))
+# How much of the file to scan for MP4 metadata before giving up until the download completes.
+_METADATA_PROBE_BYTES = 1024 * 1024
+
+# --- Ingest Configuration ---
+# "disk" writes downloads under the download folder. "memory" keeps them in an
+# anonymous in-memory file (memfd, or /dev/shm where memfd isn't available),
+# so the service can run on a read-only or ephemeral disk.
+INGEST_MODE = os.getenv("INGEST_MODE", "disk").lower()
+# Temp files older than this are considered orphaned by a crashed job.
+TEMP_FILE_MAX_AGE_SECONDS = float(os.getenv("TEMP_FILE_MAX_AGE_SECONDS", "3600"))
+_SHM_DIR = "/dev/shm"
+
+
+class VideoRejectedError(ValueError):
+    """Raised when a video is too large or too long to analyze."""
+
+
+# --- Shared HTTP Session ---
+_session: requests.Session | None = None
+_origin_slots: dict[str, threading.BoundedSemaphore] = {}
+_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """One keep-alive session per process, so repeated downloads from the same host reuse connections."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=DOWNLOAD_CONCURRENCY_PER_ORIGIN)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+@contextmanager
+def _origin_slot(url: str):
+    """Limits how many downloads run against the same host at once."""
+    origin = urlsplit(url).netloc
+    with _lock:
+        slot = _origin_slots.setdefault(origin, threading.BoundedSemaphore(DOWNLOAD_CONCURRENCY_PER_ORIGIN))
+    with slot:
+        yield
+
+
+# --- Size and Duration Guards ---
+def _mp4_boxes(data: bytes, start: int, end: int):
+    """
+    Yields (type, body start, body end) for the MP4 boxes laid end to end in data[start:end],
+    stopping at the first one that isn't complete in `data`.
+    """
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            (size,) = struct.unpack_from(">Q", data, offset + 8)
+            header = 16
+        elif size == 0:
+            # The last box in the file runs to its end.
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def mp4_duration_seconds(data: bytes) -> float | None:
+    """
+    Reads the duration from the 'mvhd' box of an MP4/MOV file, given its first
+    bytes. Only the box headers are followed, from the top level into 'moov', so
+    bytes that happen to spell "mvhd" inside the media data are never mistaken
+    for it. Returns None if 'moov' isn't complete in `data`, e.g. because it
+    comes after the media data.
+    """
+    for box_type, moov_start, moov_end in _mp4_boxes(data, 0, len(data)):
+        if box_type != b"moov":
+            continue
+        for child_type, body, _ in _mp4_boxes(data, moov_start, moov_end):
+            if child_type != b"mvhd":
+                continue
+            try:
+                version = data[body]
+                if version == 1:
+                    timescale, duration = struct.unpack_from(">IQ", data, body + 4 + 16)
+                else:
+                    timescale, duration = struct.unpack_from(">II", data, body + 4 + 8)
+            except (IndexError, struct.error):
+                return None
+            return duration / timescale if timescale else None
+        return None
+    return None
+
+
+def check_video_size(size_bytes: int | None):
+    if size_bytes is not None and size_bytes > MAX_VIDEO_BYTES:
+        raise VideoRejectedError(
+            f"Video is too large ({size_bytes / 1e6:.0f} MB, limit {MAX_VIDEO_BYTES / 1e6:.0f} MB).")
+
 
-def download_video(url: str, download_folder: str = "temp_videos") -> str | None:
+def check_video_duration(duration_seconds: float | None):
+    if duration_seconds is not None and duration_seconds > MAX_VIDEO_DURATION_SECONDS:
+        raise VideoRejectedError(
+            f"Video is too long ({duration_seconds:.0f}s, limit {MAX_VIDEO_DURATION_SECONDS:.0f}s).")
+
+
+def check_capture_duration(cap):
+    """Applies the duration limit to an opened cv2.VideoCapture using its container metadata."""
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    if fps > 0 and frame_count > 0:
+        check_video_duration(frame_count / fps)
+
+
+def check_remote_size(url: str):
+    """Rejects a video from its Content-Length before any of it is streamed. Unknown sizes pass."""
+    try:
+        response = _get_session().head(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT_SECONDS)
+    except requests.exceptions.RequestException:
+        return
+    if response.ok and response.headers.get("Content-Length", "").isdigit():
+        check_video_size(int(response.headers["Content-Length"]))
+
+
+# --- Download Targets ---
+# In-memory files opened by this process, by the path handed to the decoder.
+_memory_files: dict[str, object] = {}
+
+
+def _open_target(download_folder: str):
+    """
+    Opens the file a download is written to, according to INGEST_MODE.
+
+    Returns:
+        tuple: (writable binary file object, path the decoder can open)
+    """
+    if INGEST_MODE == "memory":
+        if hasattr(os, "memfd_create"):
+            # The decoder reopens the memfd through /proc, so the bytes never touch a disk.
+            f = os.fdopen(os.memfd_create("video", 0), "w+b")
+            path = f"/proc/self/fd/{f.fileno()}"
+            with _lock:
+                _memory_files[path] = f
+            return f, path
+        if os.path.isdir(_SHM_DIR):
+            download_folder = _SHM_DIR
+        else:
+            print("Warning: INGEST_MODE=memory is not supported on this system, writing videos to disk.")
+
+    os.makedirs(download_folder, exist_ok=True)
+    path = os.path.join(download_folder, f"{uuid.uuid4()}.mp4")
+    return open(path, "wb"), path
+
+
+def sweep_stale_temp_files(download_folder: str = "temp_videos", max_age_seconds: float = TEMP_FILE_MAX_AGE_SECONDS) -> int:
+    """
+    Removes downloaded videos left behind by jobs that died before their
+    cleanup ran. Meant to be called once at startup.
+
+    Returns:
+        int: The number of files removed.
+    """
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for folder in (download_folder, _SHM_DIR):
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as it:
+            for entry in it:
+                if not entry.name.endswith(".mp4") or not entry.is_file():
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    continue
+    if removed:
+        print(f"Removed {removed} stale temporary video files.")
+    return removed
+
+
+# --- Download ---
+def _total_size(response: requests.Response) -> int | None:
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range and content_range.rsplit("/", 1)[1].isdigit():
+        return int(content_range.rsplit("/", 1)[1])
+    content_length = response.headers.get("Content-Length", "")
+    return int(content_length) if content_length.isdigit() else None
+
+
+def download_video(url: str, download_folder: str = "temp_videos", hasher=None) -> str | None:
     """
     Downloads a video from a given URL to a local temporary file.
-    Returns the local file path of the downloaded video.
+    Returns the local file path of the downloaded video (see INGEST_MODE).
+    If a hashlib `hasher` is given, it is fed the content as it downloads.
+
+    Connections are pooled per process, and an interrupted transfer is resumed
+    with a Range request (up to DOWNLOAD_MAX_RESUMES times). Videos over
+    MAX_VIDEO_BYTES or MAX_VIDEO_DURATION_SECONDS raise VideoRejectedError as
+    soon as the headers or the MP4 metadata show it.
     """
-    if not os.path.exists(download_folder):
-        os.makedirs(download_folder)
+    session = _get_session()
+    received = 0
+    resumes = 0
+    prefix = bytearray()
+    duration_known = False
 
+    f, local_filepath = _open_target(download_folder)
     try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
+        with _origin_slot(url):
+            while True:
+                headers = {"Range": f"bytes={received}-"} if received else {}
+                try:
+                    with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT_SECONDS, headers=headers) as response:
+                        response.raise_for_status()
+                        check_video_size(_total_size(response))
+                        # A server that ignores Range resends the whole file; skip what we already have.
+                        skip = received if received and response.status_code != 206 else 0
+
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            if skip:
+                                dropped = min(skip, len(chunk))
+                                chunk, skip = chunk[dropped:], skip - dropped
+                                if not chunk:
+                                    continue
+                            f.write(chunk)
+                            if hasher is not None:
+                                hasher.update(chunk)
+                            received += len(chunk)
+                            check_video_size(received)
 
-        unique_filename = f"{uuid.uuid4()}.mp4"
-        local_filepath = os.path.join(download_folder, unique_filename)
+                            if not duration_known and len(prefix) < _METADATA_PROBE_BYTES:
+                                prefix += chunk[:_METADATA_PROBE_BYTES - len(prefix)]
+                                duration = mp4_duration_seconds(bytes(prefix))
+                                if duration is not None:
+                                    check_video_duration(duration)
+                                    duration_known = True
+                    break
+                except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout) as e:
+                    if resumes >= DOWNLOAD_MAX_RESUMES:
+                        raise
+                    resumes += 1
+                    print(f"Download interrupted at {received} bytes ({e}); resuming (attempt {resumes}).")
+        f.flush()
+        if local_filepath not in _memory_files:
+            f.close()
 
-        with open(local_filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        # The metadata sits at the end of non-faststart MP4s, so check the finished file.
+        if not duration_known:
+            cap = cv2.VideoCapture(local_filepath)
+            try:
+                check_capture_duration(cap)
+            finally:
+                cap.release()
 
         print(f"Video downloaded successfully to {local_filepath}")
         return local_filepath
     except requests.exceptions.RequestException as e:
         print(f"Error downloading video: {e}")
+        f.close()
+        cleanup_file(local_filepath)
         return None
+    except Exception:
+        f.close()
+        cleanup_file(local_filepath)
+        raise
 
 def cleanup_file(filepath: str):
-    """Deletes the specified file from the filesystem."""
+    """Deletes the specified file from the filesystem, or releases it if it was held in memory."""
+    with _lock:
+        memory_file = _memory_files.pop(filepath, None)
+    if memory_file is not None:
+        memory_file.close()
+        return
     if filepath and os.path.exists(filepath):
         os.remove(filepath)
-        print(f"Cleaned up temporary file: {filepath}")
\ No newline at end of file
+        print(f"Cleaned up temporary file: {filepath}")
@@ -0,0 +1,195 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import metrics
+
+# --- Webhook Delivery Configuration ---
+WEBHOOK_OUTBOX_PATH = os.getenv("WEBHOOK_OUTBOX_PATH", "webhook_outbox.db")
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "15"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_BACKOFF_BASE_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_BASE_SECONDS", "2"))
+WEBHOOK_BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_MAX_SECONDS", "600"))
+WEBHOOK_SENDERS = int(os.getenv("WEBHOOK_SENDERS", "4"))
+# Sent as x-webhook-secret with every delivery. Added when sending, so it never lands in the outbox.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+_SECRET_HEADER = "x-webhook-secret"
+_POLL_INTERVAL_SECONDS = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def _connect(path: str = WEBHOOK_OUTBOX_PATH) -> sqlite3.Connection:
+    # WAL lets the worker processes append while the dispatcher reads and updates.
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA busy_timeout=30000")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def enqueue(url: str, payload: dict, headers: dict | None = None, path: str = WEBHOOK_OUTBOX_PATH) -> int:
+    """
+    Durably records a webhook delivery and returns immediately. The dispatcher
+    running in the API process picks it up and sends it, retrying on failure.
+    Safe to call from any process or thread.
+
+    `headers` are stored in the outbox with the payload, so they should only hold
+    per-delivery data; the shared secret is added by the dispatcher.
+    """
+    now = time.time()
+    connection = _connect(path)
+    try:
+        cursor = connection.execute(
+            "INSERT INTO outbox (url, payload, headers, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (url, json.dumps(payload), json.dumps(headers or {}), now, now),
+        )
+        return cursor.lastrowid
+    finally:
+        connection.close()
+
+
+class WebhookDispatcher:
+    """
+    Delivers queued webhooks from the SQLite outbox.
+
+    A single poller thread claims due deliveries and hands them to a small pool
+    of sender threads sharing one keep-alive HTTP session. Failed deliveries are
+    retried with exponential backoff up to `max_attempts`, after which they are
+    kept in the outbox with status 'failed' for inspection. Deliveries that were
+    in flight when the process stopped are resent on the next start.
+    """
+
+    def __init__(self, path: str = WEBHOOK_OUTBOX_PATH, senders: int = WEBHOOK_SENDERS,
+                 max_attempts: int = WEBHOOK_MAX_ATTEMPTS):
+        self.path = path
+        self.senders = senders
+        self.max_attempts = max_attempts
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=senders, pool_maxsize=senders)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=senders, thread_name_prefix="webhook-sender")
+        self._in_flight = threading.Semaphore(senders)
+        self._stop = threading.Event()
+        # Set when a sender frees up or stop() is called, so the poller doesn't sleep through either.
+        self._wake = threading.Event()
+        self._poller = None
+
+    def start(self):
+        connection = _connect(self.path)
+        try:
+            recovered = connection.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'").rowcount
+            # Older versions stored the secret with each delivery; it is added at send time now.
+            secret_path = f'$."{_SECRET_HEADER}"'
+            connection.execute("UPDATE outbox SET headers = json_remove(headers, ?) WHERE json_extract(headers, ?) IS NOT NULL",
+                               (secret_path, secret_path))
+        finally:
+            connection.close()
+        if recovered:
+            print(f"Requeued {recovered} webhook deliveries interrupted by the last shutdown.")
+        self._poller = threading.Thread(target=self._poll_loop, name="webhook-dispatcher", daemon=True)
+        self._poller.start()
+
+    def stop(self):
+        """Stops polling and waits for in-flight sends. Anything unsent stays in the outbox."""
+        self._stop.set()
+        self._wake.set()
+        if self._poller is not None:
+            self._poller.join()
+        self._executor.shutdown(wait=True)
+        self._session.close()
+
+    def pending_count(self) -> int:
+        connection = _connect(self.path)
+        try:
+            return connection.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+        finally:
+            connection.close()
+
+    def _poll_loop(self):
+        connection = _connect(self.path)
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                claimed = self._claim_due(connection)
+                if not claimed:
+                    self._wake.wait(_POLL_INTERVAL_SECONDS)
+                for delivery in claimed:
+                    self._executor.submit(self._send, *delivery)
+        finally:
+            connection.close()
+
+    def _claim_due(self, connection: sqlite3.Connection) -> list:
+        # Only claim as many deliveries as there are free senders, so the rest stay
+        # 'pending' in the outbox rather than piling up in memory.
+        claimed = []
+        while self._in_flight.acquire(blocking=False):
+            rows = connection.execute(
+                "UPDATE outbox SET status = 'sending' WHERE id = ("
+                "  SELECT id FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?"
+                "  ORDER BY next_attempt_at LIMIT 1"
+                ") RETURNING id, url, payload, headers, attempts",
+                (time.time(),),
+            ).fetchall()
+            if not rows:
+                self._in_flight.release()
+                break
+            claimed.append(rows[0])
+        return claimed
+
+    def _send(self, delivery_id: int, url: str, payload: str, headers: str, attempts: int):
+        connection = _connect(self.path)
+        headers = {"Content-Type": "application/json", **json.loads(headers)}
+        if WEBHOOK_SECRET:
+            headers[_SECRET_HEADER] = WEBHOOK_SECRET
+        try:
+            with metrics.span("webhook"):
+                response = self._session.post(url, data=payload, timeout=WEBHOOK_TIMEOUT_SECONDS, headers=headers)
+            response.raise_for_status()
+            connection.execute("DELETE FROM outbox WHERE id = ?", (delivery_id,))
+            metrics.record_event("webhook", outcome="delivered")
+            print(f"Successfully posted results to webhook: {url}")
+        except requests.exceptions.RequestException as e:
+            attempts += 1
+            # Client errors other than timeouts and rate limits won't succeed on a retry.
+            status = e.response.status_code if e.response is not None else None
+            permanent = status is not None and 400 <= status < 500 and status not in (408, 429)
+            if permanent or attempts >= self.max_attempts:
+                connection.execute(
+                    "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, str(e), delivery_id),
+                )
+                metrics.record_event("webhook", outcome="failed")
+                print(f"CRITICAL: Giving up on webhook {url} after {attempts} attempts. Error: {e}")
+            else:
+                delay = min(WEBHOOK_BACKOFF_MAX_SECONDS, WEBHOOK_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+                connection.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (attempts, time.time() + delay, str(e), delivery_id),
+                )
+                metrics.record_event("webhook", outcome="retried")
+                print(f"Warning: Webhook {url} failed (attempt {attempts}), retrying in {delay:.0f}s. Error: {e}")
+        finally:
+            connection.close()
+            self._in_flight.release()
+            self._wake.set()